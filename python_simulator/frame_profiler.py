@@ -0,0 +1,144 @@
+"""
+FRAME PROFILER - Per-phase frame timing for the dashboard: rolling percentiles, overlay, CSV dump
+"""
+import csv
+import time
+from collections import deque
+
+import pygame
+
+
+class FrameProfiler:
+    """Times named phases of every frame
+
+    Phases are timed explicitly with add(name, started) or by wrapping methods with instrument().
+    A phase that runs several times in a frame (or not at all) records its total for that frame,
+    so percentiles over the window show both how often and how expensive it is.
+    """
+
+    def __init__(self, phases, window=300, refresh_interval=0.25, overlay_pos=(60, 60)):
+        self.phases = list(phases)
+        self.history = {phase: deque(maxlen=window) for phase in self.phases + ["frame"]}
+        self.current = dict.fromkeys(self.phases, 0.0)
+        self.frame_started = None
+        self.frames = 0
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0.0
+
+        # Overlay: a pre-rendered box refreshed a few times a second, not every frame
+        self.visible = False
+        self.overlay_pos = overlay_pos
+        self.overlay_surface = None
+        self.overlay_rect = None
+
+        # Per-frame dump
+        self.record_path = None
+        self.record_file = None
+        self.writer = None
+        self.recorded = 0
+
+    def begin_frame(self):
+        self.frame_started = time.perf_counter()
+        for phase in self.current:
+            self.current[phase] = 0.0
+
+    def add(self, phase, started):
+        """Charge the time since started (a perf_counter() value) to phase"""
+        self.current[phase] += (time.perf_counter() - started) * 1000
+
+    def timed(self, phase, func):
+        current = self.current
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                current[phase] += (perf_counter() - started) * 1000
+        return wrapper
+
+    def instrument(self, obj, names):
+        """Replace obj's bound methods with timed versions; each method name is its own phase"""
+        for name in names:
+            setattr(obj, name, self.timed(name, getattr(obj, name)))
+
+    def end_frame(self):
+        frame_ms = (time.perf_counter() - self.frame_started) * 1000
+        self.frames += 1
+        for phase, value in self.current.items():
+            self.history[phase].append(value)
+        self.history["frame"].append(frame_ms)
+        if self.writer is not None:
+            self.writer.writerow([self.frames, f"{time.time():.3f}", f"{frame_ms:.3f}"] +
+                                 [f"{self.current[phase]:.3f}" for phase in self.phases])
+            self.recorded += 1
+
+    def percentiles(self, phase):
+        """(p50, p95, max) in ms over the rolling window"""
+        values = sorted(self.history[phase])
+        if not values:
+            return (0.0, 0.0, 0.0)
+        last = len(values) - 1
+        return (values[int(last * 0.5)], values[int(last * 0.95)], values[-1])
+
+    def summary(self):
+        return {phase: dict(zip(("p50", "p95", "max"), (round(v, 3) for v in self.percentiles(phase))))
+                for phase in ["frame"] + self.phases}
+
+    def start_recording(self, path="frame_profile.csv"):
+        self.stop_recording()
+        self.record_path = path
+        self.record_file = open(path, "w", newline="")
+        self.writer = csv.writer(self.record_file)
+        self.writer.writerow(["frame", "timestamp", "frame_ms"] + [f"{phase}_ms" for phase in self.phases])
+        self.recorded = 0
+        print(f"⏺️  Recording frame timing to {path}")
+
+    def stop_recording(self):
+        if self.record_file is not None:
+            self.record_file.close()
+            print(f"⏹️  {self.recorded} frames written to {self.record_path}")
+            self.record_file = None
+            self.writer = None
+
+    def toggle_recording(self, path="frame_profile.csv"):
+        if self.record_file is None:
+            self.start_recording(path)
+        else:
+            self.stop_recording()
+
+    def overlay_due(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        return self.visible and now - self.last_refresh >= self.refresh_interval
+
+    def refresh_overlay(self, font, fps=None, now=None):
+        """Re-render the overlay box from the current percentiles"""
+        self.last_refresh = time.perf_counter() if now is None else now
+        lines = [(f"{'phase':26} {'p50':>6} {'p95':>6} {'max':>6}  ms", (255, 255, 160))]
+        for phase in ["frame"] + self.phases:
+            p50, p95, worst = self.percentiles(phase)
+            lines.append((f"{phase:26} {p50:6.2f} {p95:6.2f} {worst:6.2f}", (230, 230, 230)))
+        footer = f"{self.frames} frames"
+        if fps is not None:
+            footer += f", {fps:.0f} FPS"
+        if self.record_file is not None:
+            footer += f", recording to {self.record_path}"
+        lines.append((footer + "  [F3 hide, F4 record]", (160, 200, 255)))
+
+        line_height = font.get_linesize()
+        rendered = [font.render(text, True, color) for text, color in lines]
+        width = max(surface.get_width() for surface in rendered) + 20
+        height = line_height * len(rendered) + 16
+        overlay = pygame.Surface((width, height))
+        overlay.fill((20, 20, 30))
+        pygame.draw.rect(overlay, (90, 90, 120), overlay.get_rect(), 1)
+        for i, surface in enumerate(rendered):
+            overlay.blit(surface, (10, 8 + i * line_height))
+        self.overlay_surface = overlay
+        self.overlay_rect = overlay.get_rect(topleft=self.overlay_pos)
+        return self.overlay_rect
+
+    def close(self):
+        self.stop_recording()
@@ -0,0 +1,268 @@
+"""
+STATE STREAM CLIENT - Rebuilds RTOS state from keyframe/delta frames
+"""
+import json
+import re
+import struct
+
+# Binary frames start with <u16 length of everything after it>
+FRAME_LENGTH = struct.Struct("<H")
+FRAME_STATE = 1
+FRAME_ACK = 2
+
+# Cheap looks into JSON lines that will not be decoded; the server writes compact JSON
+TYPE_PREFIX = re.compile(rb'\{\s*"type"\s*:\s*"(\w+)"')
+EMERGENCY_ON = re.compile(rb'"emergency"\s*:\s*true')
+FULL_STATES = (b"STATE", b"KEYFRAME")
+
+
+def apply_patch(state, changes, removed=()):
+    """Return a patched copy of state; dicts along changed paths are copied, not mutated"""
+    patched = dict(state)
+    for key, value in changes.items():
+        current = patched.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            patched[key] = apply_patch(current, value)
+        else:
+            patched[key] = value
+    for path in removed:
+        _remove_path(patched, path)
+    return patched
+
+
+def _remove_path(state, path):
+    parent = state
+    for key in path[:-1]:
+        child = parent.get(key)
+        if not isinstance(child, dict):
+            return
+        child = dict(child)
+        parent[key] = child
+        parent = child
+    parent.pop(path[-1], None)
+
+
+class DeltaStateStream:
+    """Tracks the sequence of a delta stream and detects gaps"""
+
+    def __init__(self):
+        self.state = None
+        self.seq = None
+        self.awaiting_keyframe = True
+        self.keyframes = 0
+        self.deltas = 0
+        self.gaps = 0
+
+    def reset(self):
+        """Forget everything, e.g. after a reconnect"""
+        self.state = None
+        self.seq = None
+        self.awaiting_keyframe = True
+
+    def apply(self, frame):
+        """Apply one decoded frame. Returns the full state, or None if the frame cannot be used"""
+        kind = frame.get("type")
+        if kind == "KEYFRAME":
+            self.state = frame["state"]
+            self.seq = frame["seq"]
+            self.awaiting_keyframe = False
+            self.keyframes += 1
+            return self.state
+        if kind == "ACK":
+            return None  # Command acknowledgement, not state
+        if kind == "DELTA":
+            if self.awaiting_keyframe:
+                return None
+            if frame["seq"] != self.seq + 1:
+                # Missed at least one patch, the local copy can no longer be trusted
+                self.gaps += 1
+                self.awaiting_keyframe = True
+                return None
+            self.state = apply_patch(self.state, frame.get("changes", {}), frame.get("removed", ()))
+            self.seq = frame["seq"]
+            self.deltas += 1
+            return self.state
+        # Plain full state from a server that does not speak the delta protocol
+        return frame
+
+
+class BinaryStateDecoder:
+    """Unpacks fixed-layout binary frames using the layout from the server handshake"""
+
+    def __init__(self, handshake):
+        self.header = struct.Struct(handshake["header"])
+        self.fields = [(tuple(path), enum) for path, _, enum in handshake["fields"]]
+        self.body = struct.Struct("<" + "".join(code for _, code, _ in handshake["fields"]))
+        self.enums = handshake["enums"]
+
+        # Where each field sits in a frame, for reading one value without unpacking the rest
+        self.offsets = {}
+        position = self.header.size
+        for path, code, _ in handshake["fields"]:
+            field = struct.Struct("<" + code)
+            self.offsets[tuple(path)] = (position, field)
+            position += field.size
+
+    def kind(self, frame):
+        return self.header.unpack_from(frame)[1]
+
+    def peek(self, frame, path):
+        """One raw field of a state frame, or None if the layout has no such field"""
+        if path not in self.offsets:
+            return None
+        position, field = self.offsets[path]
+        return field.unpack_from(frame, position)[0]
+
+    def decode(self, frame):
+        """Return the state dict for one complete frame (length prefix included)"""
+        _, kind, seq = self.header.unpack_from(frame)
+        if kind == FRAME_ACK:
+            return json.loads(bytes(frame[self.header.size:]))
+        if kind != FRAME_STATE:
+            return None
+        state = {}
+        values = self.body.unpack_from(frame, self.header.size)
+        for (path, enum), value in zip(self.fields, values):
+            if enum is not None:
+                table = self.enums[enum]
+                value = table[value] if value < len(table) else "UNKNOWN"
+            target = state
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        state["seq"] = seq
+        return state
+
+
+class FrameReader:
+    """Splits the byte stream from the RTOS into decoded frames, keeping partial frames between reads"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.binary = None
+        self.malformed = 0
+        self.decoded = 0  # State frames fully parsed by feed_latest()
+        self.skipped = 0  # State frames it only scanned
+
+    def reset(self):
+        self.buffer.clear()
+        self.binary = None
+
+    def feed(self, data):
+        """Add received bytes and return every frame that is now complete"""
+        self.buffer.extend(data)
+        frames = []
+        offset = 0
+        buffer = self.buffer
+        while True:
+            if self.binary is None:
+                newline = buffer.find(b"\n", offset)
+                if newline < 0:
+                    break
+                line = bytes(buffer[offset:newline])
+                offset = newline + 1
+                if not line.strip():
+                    continue
+                try:
+                    frame = json.loads(line)
+                except ValueError:
+                    self.malformed += 1
+                    continue
+                if frame.get("type") == "HANDSHAKE" and frame.get("format") == "binary":
+                    self.binary = BinaryStateDecoder(frame)
+                    continue
+                frames.append(frame)
+            else:
+                if len(buffer) - offset < FRAME_LENGTH.size:
+                    break
+                (length,) = FRAME_LENGTH.unpack_from(buffer, offset)
+                end = offset + FRAME_LENGTH.size + length
+                if end > len(buffer):
+                    break
+                frame = self.binary.decode(bytes(buffer[offset:end]))
+                offset = end
+                if frame is not None:
+                    frames.append(frame)
+        # Drop consumed bytes once per read instead of once per frame
+        del buffer[:offset]
+        return frames
+
+    def feed_latest(self, data):
+        """Like feed(), but only decodes what is needed to reach the newest state
+
+        Returns (frames, emergency_seen). frames holds every ack and every state frame from the
+        newest full state (plain state or keyframe) on, since later deltas build on it. Older state
+        frames are only scanned: emergency_seen is True if any of them had the emergency flag set,
+        so an emergency that starts and ends within one backlog still raises its alert.
+        """
+        self.buffer.extend(data)
+        buffer = self.buffer
+        pending = []  # (kind, raw frame, is_binary) in arrival order
+        offset = 0
+        while True:
+            if self.binary is None:
+                newline = buffer.find(b"\n", offset)
+                if newline < 0:
+                    break
+                line = bytes(buffer[offset:newline])
+                offset = newline + 1
+                if not line.strip():
+                    continue
+                match = TYPE_PREFIX.match(line)
+                kind = match.group(1) if match else b"STATE"
+                if kind == b"HANDSHAKE":
+                    # Decoded at once: everything after a binary handshake is binary
+                    try:
+                        frame = json.loads(line)
+                    except ValueError:
+                        self.malformed += 1
+                        continue
+                    if frame.get("format") == "binary":
+                        self.binary = BinaryStateDecoder(frame)
+                        continue
+                pending.append((kind, line, False))
+            else:
+                if len(buffer) - offset < FRAME_LENGTH.size:
+                    break
+                (length,) = FRAME_LENGTH.unpack_from(buffer, offset)
+                end = offset + FRAME_LENGTH.size + length
+                if end > len(buffer):
+                    break
+                frame = bytes(buffer[offset:end])
+                offset = end
+                kind = self.binary.kind(frame)
+                if kind == FRAME_STATE:
+                    pending.append((b"STATE", frame, True))
+                elif kind == FRAME_ACK:
+                    pending.append((b"ACK", frame, True))
+        del buffer[:offset]
+
+        base = 0
+        for index in range(len(pending) - 1, -1, -1):
+            if pending[index][0] in FULL_STATES:
+                base = index
+                break
+
+        frames = []
+        emergency_seen = False
+        for index, (kind, raw, is_binary) in enumerate(pending):
+            if index < base and kind in (b"STATE", b"KEYFRAME", b"DELTA"):
+                self.skipped += 1
+                if is_binary:
+                    emergency_seen = emergency_seen or bool(self.binary.peek(raw, ("emergency",)))
+                elif EMERGENCY_ON.search(raw):
+                    emergency_seen = True
+                continue
+            if is_binary:
+                frame = self.binary.decode(raw)
+            else:
+                try:
+                    frame = json.loads(raw)
+                except ValueError:
+                    self.malformed += 1
+                    continue
+            if kind != b"ACK":
+                self.decoded += 1
+            if frame is not None:
+                frames.append(frame)
+        return frames, emergency_seen
@@ -0,0 +1,50 @@
+"""
+TEXT CACHE - Reuses rendered text surfaces across frames
+"""
+from collections import OrderedDict
+
+
+class TextCache:
+    """Bounded LRU of font.render() results keyed by (font, text, color)
+
+    Dashboard labels are mostly identical from one frame to the next, so steady-state frames
+    only blit. Returned surfaces are shared: blit them, never draw on them.
+    """
+
+    def __init__(self, fonts, max_entries=512):
+        self.fonts = fonts  # Name -> pygame.font.Font, as in AdvancedTrafficVisualization.fonts
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, antialias=True):
+        """Cached equivalent of self.fonts[font].render(text, antialias, color)"""
+        key = (font, text, tuple(color), antialias)
+        surfaces = self.surfaces
+        surface = surfaces.get(key)
+        if surface is not None:
+            surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.fonts[font].render(text, antialias, color)
+        surfaces[key] = surface
+        if len(surfaces) > self.max_entries:
+            surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+        }
@@ -7,9 +7,13 @@ import json
 import threading
 import time
 from datetime import datetime
+from state_stream import DeltaStateStream, FrameReader
+from text_cache import TextCache
+from weather_particles import WeatherParticles
+from frame_profiler import FrameProfiler
 
 class AdvancedTrafficVisualization:
-    def __init__(self):
+    def __init__(self, stream_mode="full", wire_format="json", profile_path=None):
         pygame.init()
         self.screen = pygame.display.set_mode((1400, 900))
         pygame.display.set_caption("RTOS Traffic Control - WITH WEATHER")
@@ -45,6 +49,7 @@ class AdvancedTrafficVisualization:
             'small': pygame.font.SysFont('Consolas', 16),
             'tiny': pygame.font.SysFont('Consolas', 14)
         }
+        self.text = TextCache(self.fonts)  # Labels repeat every frame, render each one once
         
         # RTOS Connection
         self.rtos_state = {
@@ -59,21 +64,53 @@ class AdvancedTrafficVisualization:
         self.connected = False
         self.last_state_update = 0
         
+        # "full" = complete state every tick, "delta" = keyframes plus changed keys
+        self.stream_mode = stream_mode
+        self.state_stream = DeltaStateStream()
+        self.resync_requested = False
+        
+        # "json" = newline-delimited JSON, "binary" = struct frames described at handshake
+        self.wire_format = wire_format
+        self.frame_reader = FrameReader()
+        
+        # Commands carry an id; the server acks each one
+        self.command_id = 0
+        self.unacked_commands = {}  # id -> (event, sent_at)
+        
         # Event indicators
         self.event_messages = []
         self.last_emergency_time = 0
         self.last_pedestrian_time = 0
         
         # Weather animation
-        self.weather_particles = []
-        self.last_weather_update = 0
+        self.particles = WeatherParticles(*self.screen.get_size())
+        self.pending_weather = None  # Set by the comm thread, applied by the render loop
+        self.last_weather_update = time.perf_counter()
+        
+        # Retained-mode rendering: static scene cached, panels redrawn only when their inputs change
+        self.static_key = None     # (background, emergency, fog) the cached layers were built for
+        self.static_frame = None   # Opaque: background, panels, roads, light housings, controls
+        self.scene_layer = None    # Same without the background, composited over weather particles
+        self.panel_keys = {}       # Panel name -> inputs it was last drawn from
+        self.particles_drawn = False
+        self.force_full_redraw = True
+        
+        # Frame timing per phase: F3 shows the overlay, F4 writes every frame to profile_path
+        timed_methods = ['update_weather_particles', 'draw_weather_particles', 'build_scene',
+                         'draw_intersection', 'draw_rtos_tasks', 'draw_performance_metrics',
+                         'draw_event_log', 'draw_sensors', 'draw_status']
+        self.profiler = FrameProfiler(['events'] + timed_methods + ['render', 'overlay', 'display'])
+        self.profiler.instrument(self, timed_methods)
+        self.profile_path = profile_path or "frame_profile.csv"
+        if profile_path:
+            self.profiler.start_recording(profile_path)
         
         # Initialize
         self.setup_rtos_connection()
         self.setup_ui_elements()
         
         print("🌈 Visualization with WEATHER EFFECTS Started")
-        print("   Controls: E=Emergency, P=Pedestrian, W=Weather, R=Reset")
+        print("   Controls: E=Emergency, P=Pedestrian, W=Weather, R=Reset, F3=Profiler, F4=Record timing")
         print("   Weather colors: Blue=CLEAR, Gray=RAIN, White=SNOW")
     
     def setup_rtos_connection(self):
@@ -94,13 +131,22 @@ class AdvancedTrafficVisualization:
                     self.connected = True
                     print("✅ Connected to RTOS!")
                     self.add_event_message("Connected to RTOS", "SUCCESS")
+                    
+                    self.state_stream.reset()
+                    self.frame_reader.reset()
+                    self.unacked_commands.clear()
+                    if self.stream_mode != "full" or self.wire_format != "json":
+                        subscribe = {'event': 'SUBSCRIBE',
+                                     'data': {'mode': self.stream_mode, 'format': self.wire_format}}
+                        self.rtos_socket.sendall((json.dumps(subscribe) + "\n").encode())
+                        self.resync_requested = True  # Server answers with a keyframe
                 
                 # Send heartbeat
                 current_time = time.time()
                 if current_time - self.last_state_update > 10:
                     try:
                         heartbeat = {'event': 'HEARTBEAT', 'timestamp': current_time}
-                        self.rtos_socket.send(json.dumps(heartbeat).encode())
+                        self.rtos_socket.sendall((json.dumps(heartbeat) + "\n").encode())
                     except:
                         self.connected = False
                         self.rtos_socket = None
@@ -108,39 +154,14 @@ class AdvancedTrafficVisualization:
                 
                 # Receive data
                 try:
-                    data = self.rtos_socket.recv(65536).decode()
+                    data = self.rtos_socket.recv(65536)
                     if data:
-                        lines = data.strip().split('\n')
-                        for line in lines:
-                            if line:
-                                try:
-                                    new_state = json.loads(line)
-                                    self.rtos_state.update(new_state)
-                                    self.last_state_update = current_time
-                                    
-                                    # Check for weather change
-                                    old_weather = self.rtos_state.get('weather', 'CLEAR')
-                                    new_weather = new_state.get('weather', old_weather)
-                                    if new_weather != old_weather:
-                                        self.add_event_message(f"Weather changed to: {new_weather}", "INFO")
-                                        self.generate_weather_particles(new_weather)
-                                    
-                                    # Check for emergency
-                                    if new_state.get('emergency', False) and not self.rtos_state.get('last_emergency', False):
-                                        self.add_event_message("🚑 EMERGENCY VEHICLE!", "DANGER")
-                                        self.last_emergency_time = current_time
-                                    
-                                    # Check for pedestrian
-                                    tasks = new_state.get('tasks', {})
-                                    if tasks.get('Pedestrian', {}).get('state') == 'RUNNING':
-                                        if current_time - self.last_pedestrian_time > 1:
-                                            self.add_event_message("🚶 PEDESTRIAN CROSSING", "WARNING")
-                                            self.last_pedestrian_time = current_time
-                                    
-                                    self.rtos_state['last_emergency'] = new_state.get('emergency', False)
-                                    
-                                except json.JSONDecodeError:
-                                    pass
+                        # A backlog is parsed down to the newest state; skipped frames are only scanned
+                        frames, emergency_seen = self.frame_reader.feed_latest(data)
+                        if emergency_seen:
+                            self.note_emergency(current_time)
+                        for frame in frames:
+                            self.apply_rtos_frame(frame, current_time)
                 except socket.timeout:
                     pass
                     
@@ -154,99 +175,67 @@ class AdvancedTrafficVisualization:
                 print(f"⚠️ Communication error: {e}")
                 time.sleep(1)
     
+    def apply_rtos_frame(self, frame, current_time):
+        """Merge one decoded frame into rtos_state and raise event messages"""
+        if frame.get('type') == 'ACK':
+            self.handle_ack(frame)
+            return
+        new_state = self.state_stream.apply(frame)
+        if new_state is None:
+            # Sequence gap in the delta stream: ask for a keyframe once
+            if self.state_stream.awaiting_keyframe and not self.resync_requested:
+                self.rtos_socket.sendall((json.dumps({'event': 'RESYNC'}) + "\n").encode())
+                self.resync_requested = True
+            return
+        self.resync_requested = False
+        
+        old_weather = self.rtos_state.get('weather', 'CLEAR')
+        self.rtos_state.update(new_state)
+        self.last_state_update = current_time
+        
+        # Check for weather change
+        new_weather = new_state.get('weather', old_weather)
+        if new_weather != old_weather:
+            self.add_event_message(f"Weather changed to: {new_weather}", "INFO")
+            self.generate_weather_particles(new_weather)
+        
+        # Check for emergency
+        if new_state.get('emergency', False):
+            self.note_emergency(current_time)
+        
+        # Check for pedestrian
+        tasks = new_state.get('tasks', {})
+        if tasks.get('Pedestrian', {}).get('state') == 'RUNNING':
+            if current_time - self.last_pedestrian_time > 1:
+                self.add_event_message("🚶 PEDESTRIAN CROSSING", "WARNING")
+                self.last_pedestrian_time = current_time
+        
+        self.rtos_state['last_emergency'] = new_state.get('emergency', False)
+    
+    def note_emergency(self, current_time):
+        """Alert on the rising edge, whether seen in the newest state or a skipped one"""
+        if not self.rtos_state.get('last_emergency', False):
+            self.add_event_message("🚑 EMERGENCY VEHICLE!", "DANGER")
+            self.last_emergency_time = current_time
+            self.rtos_state['last_emergency'] = True
+    
     def generate_weather_particles(self, weather):
-        """Generate particles based on weather"""
-        self.weather_particles = []
-        current_time = time.time()
-        
-        if weather == "RAIN":
-            # Rain drops
-            for _ in range(100):
-                self.weather_particles.append({
-                    'x': pygame.time.get_ticks() % 1400,  # Random start
-                    'y': -10,
-                    'speed': 8 + pygame.time.get_ticks() % 5,
-                    'type': 'rain'
-                })
-        elif weather == "SNOW":
-            # Snow flakes
-            for _ in range(50):
-                self.weather_particles.append({
-                    'x': pygame.time.get_ticks() % 1400,
-                    'y': -10,
-                    'speed': 2 + pygame.time.get_ticks() % 2,
-                    'drift': (pygame.time.get_ticks() % 10) - 5,
-                    'type': 'snow'
-                })
-        elif weather == "FOG":
-            # Fog particles
-            for _ in range(30):
-                self.weather_particles.append({
-                    'x': pygame.time.get_ticks() % 1400,
-                    'y': 100 + pygame.time.get_ticks() % 600,
-                    'size': 20 + pygame.time.get_ticks() % 30,
-                    'type': 'fog'
-                })
-        
-        self.last_weather_update = current_time
+        """Restart the particle pool for a new weather on the next frame"""
+        self.pending_weather = weather
     
     def update_weather_particles(self):
-        """Update weather particle positions"""
-        current_time = time.time()
-        
-        # Update existing particles
-        for particle in self.weather_particles[:]:
-            if particle['type'] == 'rain':
-                particle['y'] += particle['speed']
-                if particle['y'] > 900:
-                    self.weather_particles.remove(particle)
-            elif particle['type'] == 'snow':
-                particle['y'] += particle['speed']
-                particle['x'] += particle.get('drift', 0)
-                if particle['y'] > 900 or particle['x'] < -10 or particle['x'] > 1410:
-                    self.weather_particles.remove(particle)
-        
-        # Add new particles occasionally
-        weather = self.rtos_state.get('weather', 'CLEAR')
-        if weather == "RAIN" and current_time - self.last_weather_update > 0.05:
-            self.weather_particles.append({
-                'x': pygame.time.get_ticks() % 1400,
-                'y': -10,
-                'speed': 8 + pygame.time.get_ticks() % 5,
-                'type': 'rain'
-            })
-            self.last_weather_update = current_time
-        elif weather == "SNOW" and current_time - self.last_weather_update > 0.1:
-            self.weather_particles.append({
-                'x': pygame.time.get_ticks() % 1400,
-                'y': -10,
-                'speed': 2 + pygame.time.get_ticks() % 2,
-                'drift': (pygame.time.get_ticks() % 10) - 5,
-                'type': 'snow'
-            })
-            self.last_weather_update = current_time
+        """Move all particles by the time since the last frame"""
+        weather, self.pending_weather = self.pending_weather, None
+        if weather is not None:
+            self.particles.set_weather(weather)
+        now = time.perf_counter()
+        dt = min(now - self.last_weather_update, 0.1)  # A stalled window should not fast-forward
+        self.last_weather_update = now
+        self.particles.update(dt)
     
     def draw_weather_particles(self, surface):
         """Draw weather particles"""
-        weather = self.rtos_state.get('weather', 'CLEAR')
-        
-        for particle in self.weather_particles:
-            if particle['type'] == 'rain':
-                # Rain drop - blue line
-                pygame.draw.line(surface, (100, 150, 255), 
-                               (particle['x'], particle['y']),
-                               (particle['x'], particle['y'] + 10), 2)
-            elif particle['type'] == 'snow':
-                # Snow flake - white circle
-                pygame.draw.circle(surface, (255, 255, 255),
-                                 (int(particle['x']), int(particle['y'])), 3)
-            elif particle['type'] == 'fog':
-                # Fog - semi-transparent circle
-                fog_surface = pygame.Surface((particle['size'], particle['size']), pygame.SRCALPHA)
-                pygame.draw.circle(fog_surface, (255, 255, 255, 50),
-                                 (particle['size']//2, particle['size']//2),
-                                 particle['size']//2)
-                surface.blit(fog_surface, (particle['x'], particle['y']))
+        self.particles.draw(surface)
     
     def add_event_message(self, message, msg_type="INFO"):
         """Add an event message to display"""
@@ -268,6 +257,10 @@ class AdvancedTrafficVisualization:
             'controls': {'rect': pygame.Rect(500, 690, 400, 130), 'title': 'CONTROLS'},
             'status': {'rect': pygame.Rect(950, 540, 400, 280), 'title': 'SYSTEM STATUS'}
         }
+        # Screen area owned by each panel, title bar included
+        self.panel_regions = {name: pygame.Rect(info['rect'].x, info['rect'].y - 25,
+                                                info['rect'].width, info['rect'].height + 25)
+                              for name, info in self.panels.items()}
     
     def get_background_color(self):
         """Get background color based on weather and emergency"""
@@ -297,11 +290,22 @@ class AdvancedTrafficVisualization:
         # Title
         title_rect = pygame.Rect(rect.x, rect.y - 25, rect.width, 25)
         pygame.draw.rect(surface, self.colors['PANEL_BORDER'], title_rect, border_radius=8)
-        title_text = self.fonts['small'].render(title, True, self.colors['TEXT'])
+        title_text = self.text.render('small', title, self.colors['TEXT'])
         surface.blit(title_text, (rect.x + 10, rect.y - 22))
     
-    def draw_intersection(self, surface, rect, lights, emergency=False):
-        """Draw an intersection with lights"""
+    def light_positions(self, rect):
+        """Where the four signal heads of an intersection stand"""
+        center_x = rect.x + rect.width // 2
+        center_y = rect.y + rect.height // 2
+        return [
+            (center_x - 120, center_y, 'EW'),
+            (center_x + 120, center_y, 'EW'),
+            (center_x, center_y - 120, 'NS'),
+            (center_x, center_y + 120, 'NS')
+        ]
+    
+    def draw_intersection_base(self, surface, rect, emergency=False):
+        """Draw the parts of an intersection that do not change with the lights"""
         center_x = rect.x + rect.width // 2
         center_y = rect.y + rect.height // 2
         
@@ -323,24 +327,23 @@ class AdvancedTrafficVisualization:
             pygame.draw.rect(surface, (255, 255, 255), (i, center_y - 5, 20, 3))
             pygame.draw.rect(surface, (255, 255, 255), (center_x - 5, i - rect.x + 50, 3, 20))
         
-        # Traffic lights
-        light_positions = [
-            (center_x - 120, center_y, 'EW'),
-            (center_x + 120, center_y, 'EW'),
-            (center_x, center_y - 120, 'NS'),
-            (center_x, center_y + 120, 'NS')
-        ]
-        
-        for x, y, direction in light_positions:
+        # Traffic light housings
+        for x, y, direction in self.light_positions(rect):
+            self.draw_light_housing(surface, x, y)
+    
+    def draw_intersection(self, surface, rect, lights, emergency=False):
+        """Draw the lit signals of an intersection over its cached base"""
+        for x, y, direction in self.light_positions(rect):
             self.draw_traffic_light(surface, x, y, direction, lights.get(direction, 'RED'))
         
         # Emergency indicator
         if emergency:
-            warning_text = self.fonts['medium'].render("🚑 EMERGENCY", True, self.colors['DANGER'])
+            center_x = rect.x + rect.width // 2
+            warning_text = self.text.render('medium', "🚑 EMERGENCY", self.colors['DANGER'])
             surface.blit(warning_text, (center_x - 60, rect.y + 20))
     
-    def draw_traffic_light(self, surface, x, y, direction, state):
-        """Draw a traffic light"""
+    def draw_light_housing(self, surface, x, y):
+        """Draw a traffic light's pole and box"""
         # Pole
         pygame.draw.rect(surface, (100, 100, 100), (x - 5, y - 60, 10, 60))
         
@@ -348,7 +351,9 @@ class AdvancedTrafficVisualization:
         light_box = pygame.Rect(x - 25, y - 100, 50, 80)
         pygame.draw.rect(surface, (50, 50, 50), light_box, border_radius=4)
         pygame.draw.rect(surface, (30, 30, 30), light_box, 2, border_radius=4)
-        
+    
+    def draw_traffic_light(self, surface, x, y, direction, state):
+        """Draw a traffic light's lamps"""
         # Lights
         light_states = ['RED', 'YELLOW', 'GREEN']
         for i, light_state in enumerate(light_states):
@@ -383,7 +388,7 @@ class AdvancedTrafficVisualization:
             
             # Task text
             task_text = f"{task_name:20} {state:10} P:{priority}"
-            text_surface = self.fonts['small'].render(task_text, True, color)
+            text_surface = self.text.render('small', task_text, color)
             surface.blit(text_surface, (rect.x + 10, y))
             y += 25
     
@@ -398,7 +403,7 @@ class AdvancedTrafficVisualization:
         response_time = metrics.get('emergency_response_time', 0)
         response_text = f"Response: {response_time:.1f}ms"
         response_color = self.colors['SUCCESS'] if response_time <= 500 else self.colors['DANGER']
-        text_surface = self.fonts['small'].render(response_text, True, response_color)
+        text_surface = self.text.render('small', response_text, response_color)
         surface.blit(text_surface, (rect.x + 10, y))
         y += 25
         
@@ -406,21 +411,28 @@ class AdvancedTrafficVisualization:
         misses = metrics.get('deadline_misses', 0)
         misses_text = f"Deadline Misses: {misses}"
         misses_color = self.colors['DANGER'] if misses > 0 else self.colors['TEXT']
-        misses_surface = self.fonts['small'].render(misses_text, True, misses_color)
+        misses_surface = self.text.render('small', misses_text, misses_color)
         surface.blit(misses_surface, (rect.x + 10, y))
         y += 25
         
         # CPU Utilization
         cpu = metrics.get('cpu_utilization', 0)
         cpu_text = f"CPU: {cpu:.1f}%"
-        cpu_surface = self.fonts['small'].render(cpu_text, True, self.colors['TEXT'])
+        cpu_surface = self.text.render('small', cpu_text, self.colors['TEXT'])
         surface.blit(cpu_surface, (rect.x + 10, y))
+        y += 25
+        
+        # Vehicle wait time
+        wait = metrics.get('avg_wait_time', 0)
+        wait_text = f"Avg Wait: {wait:.1f}s"
+        wait_surface = self.text.render('small', wait_text, self.colors['TEXT'])
+        surface.blit(wait_surface, (rect.x + 10, y))
     
     def draw_event_log(self, surface, rect):
         """Draw event log messages"""
         y = rect.y + 20
         for i, message in enumerate(self.event_messages[:8]):
-            text_surface = self.fonts['tiny'].render(message, True, self.colors['TEXT'])
+            text_surface = self.text.render('tiny', message, self.colors['TEXT'])
             surface.blit(text_surface, (rect.x + 10, y))
             y += 22
     
@@ -436,12 +448,12 @@ class AdvancedTrafficVisualization:
         vehicles_ew = sensors.get('vehicle_count_ew', 0)
         
         vehicles_text = f"Vehicles NS: {vehicles_ns}"
-        text_surface = self.fonts['small'].render(vehicles_text, True, self.colors['TEXT'])
+        text_surface = self.text.render('small', vehicles_text, self.colors['TEXT'])
         surface.blit(text_surface, (rect.x + 10, y))
         y += 25
         
         vehicles_text = f"Vehicles EW: {vehicles_ew}"
-        text_surface = self.fonts['small'].render(vehicles_text, True, self.colors['TEXT'])
+        text_surface = self.text.render('small', vehicles_text, self.colors['TEXT'])
         surface.blit(text_surface, (rect.x + 10, y))
     
     def draw_controls(self, surface, rect):
@@ -458,7 +470,7 @@ class AdvancedTrafficVisualization:
         ]
         
         for control in controls:
-            text_surface = self.fonts['small'].render(control, True, self.colors['TEXT'])
+            text_surface = self.text.render('small', control, self.colors['TEXT'])
             surface.blit(text_surface, (rect.x + 10, y))
             y += 22
     
@@ -470,7 +482,7 @@ class AdvancedTrafficVisualization:
         status = "CONNECTED" if self.connected else "DISCONNECTED"
         status_color = self.colors['SUCCESS'] if self.connected else self.colors['DANGER']
         status_text = f"RTOS: {status}"
-        status_surface = self.fonts['medium'].render(status_text, True, status_color)
+        status_surface = self.text.render('medium', status_text, status_color)
         surface.blit(status_surface, (rect.x + 10, y))
         y += 30
         
@@ -478,14 +490,14 @@ class AdvancedTrafficVisualization:
         emergency = system_state.get('emergency', False)
         emergency_text = "🚑 EMERGENCY ACTIVE" if emergency else "✅ Normal Operation"
         emergency_color = self.colors['DANGER'] if emergency else self.colors['SUCCESS']
-        emergency_surface = self.fonts['small'].render(emergency_text, True, emergency_color)
+        emergency_surface = self.text.render('small', emergency_text, emergency_color)
         surface.blit(emergency_surface, (rect.x + 10, y))
         y += 25
         
         # Weather with color indicator
         weather = system_state.get('weather', 'CLEAR')
         weather_text = f"Weather: {weather}"
-        weather_surface = self.fonts['small'].render(weather_text, True, self.colors['TEXT'])
+        weather_surface = self.text.render('small', weather_text, self.colors['TEXT'])
         surface.blit(weather_surface, (rect.x + 10, y))
         
         # Weather color indicator box
@@ -497,24 +509,172 @@ class AdvancedTrafficVisualization:
         # Uptime
         uptime = system_state.get('system_health', {}).get('uptime', 0)
         uptime_text = f"Uptime: {uptime:.0f}s"
-        uptime_surface = self.fonts['small'].render(uptime_text, True, self.colors['TEXT'])
+        uptime_surface = self.text.render('small', uptime_text, self.colors['TEXT'])
         surface.blit(uptime_surface, (rect.x + 10, y))
     
+    def build_scene(self, surface, emergency):
+        """Draw everything that only changes with weather or emergency onto surface"""
+        for panel_info in self.panels.values():
+            self.draw_panel(surface, panel_info['rect'], panel_info['title'])
+        self.draw_intersection_base(surface, self.panels['intersection1']['rect'], emergency)
+        self.draw_intersection_base(surface, self.panels['intersection2']['rect'], emergency)
+        self.draw_controls(surface, self.panels['controls']['rect'])
+    
+    def panel_inputs(self):
+        """What each dynamic panel is drawn from; a panel is redrawn when its entry changes"""
+        state = self.rtos_state
+        lights = state.get('lights', {})
+        emergency = state.get('emergency', False)
+        metrics = state.get('metrics', {})
+        sensors = state.get('sensors', {})
+        intersection = (lights.get('NS'), lights.get('EW'), emergency)
+        return {
+            'intersection1': intersection,
+            'intersection2': intersection,
+            'rtos_tasks': tuple((name, info.get('state'), info.get('priority'))
+                                for name, info in state.get('tasks', {}).items()),
+            'performance': tuple(sorted(metrics.items())),
+            'events': tuple(self.event_messages[:8]),
+            'sensors': (sensors.get('vehicle_count_ns'), sensors.get('vehicle_count_ew')),
+            'status': (self.connected, emergency, state.get('weather', 'CLEAR'),
+                       round(state.get('system_health', {}).get('uptime', 0)))
+        }
+    
+    def draw_panel_content(self, name):
+        """Draw the dynamic part of one panel directly on the screen"""
+        rect = self.panels[name]['rect']
+        state = self.rtos_state
+        if name in ('intersection1', 'intersection2'):
+            self.draw_intersection(self.screen, rect, state.get('lights', {}), state.get('emergency', False))
+        elif name == 'rtos_tasks':
+            self.draw_rtos_tasks(self.screen, rect, state.get('tasks', {}))
+        elif name == 'performance':
+            self.draw_performance_metrics(self.screen, rect, state.get('metrics', {}))
+        elif name == 'events':
+            self.draw_event_log(self.screen, rect)
+        elif name == 'sensors':
+            self.draw_sensors(self.screen, rect, state.get('sensors', {}))
+        elif name == 'status':
+            self.draw_status(self.screen, rect, state)
+    
+    def render_frame(self):
+        """Redraw what changed since the last frame and return the screen rects to update"""
+        self.update_weather_particles()
+        background = self.get_background_color()
+        emergency = self.rtos_state.get('emergency', False)
+        # Fog does not move, so it is baked into the static frame along with the scene
+        static_particles = self.particles.generation if self.particles.static else None
+        if (background, emergency, static_particles) != self.static_key:
+            self.static_key = (background, emergency, static_particles)
+            self.static_frame = pygame.Surface(self.screen.get_size()).convert()
+            self.static_frame.fill(background)
+            if static_particles is not None:
+                self.draw_weather_particles(self.static_frame)
+            self.build_scene(self.static_frame, emergency)
+            self.scene_layer = None
+            self.force_full_redraw = True
+        
+        inputs = self.panel_inputs()
+        full = True
+        if self.particles.moving or self.particles_drawn:
+            # Particles move behind the semi-transparent panels, so every pixel can change
+            if self.scene_layer is None:
+                self.scene_layer = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+                self.build_scene(self.scene_layer, emergency)
+            self.screen.fill(background)
+            self.draw_weather_particles(self.screen)
+            self.screen.blit(self.scene_layer, (0, 0))
+            self.particles_drawn = self.particles.moving
+        elif self.force_full_redraw:
+            self.screen.blit(self.static_frame, (0, 0))
+        else:
+            full = False
+        
+        dirty_panels = list(inputs)
+        if not full:
+            dirty_panels = [name for name, key in inputs.items() if self.panel_keys.get(name) != key]
+            for name in dirty_panels:
+                region = self.panel_regions[name]
+                self.screen.blit(self.static_frame, region, region)
+        
+        for name in dirty_panels:
+            self.draw_panel_content(name)
+        self.panel_keys = inputs
+        
+        if full:
+            self.force_full_redraw = False
+            return [self.screen.get_rect()]
+        return [self.panel_regions[name] for name in dirty_panels]
+    
+    def invalidate_rect(self, rect):
+        """Restore rect from the static frame and have the panels under it redrawn next render"""
+        if self.static_frame is not None:
+            self.screen.blit(self.static_frame, rect, rect)
+        for name, region in self.panel_regions.items():
+            if region.colliderect(rect):
+                self.panel_keys.pop(name, None)
+    
+    def update_profiler_overlay(self, dirty_rects, fps):
+        """Keep the overlay on top: redraw it when refreshed or when a redraw went under it"""
+        profiler = self.profiler
+        if not profiler.visible or profiler.overlay_surface is None:
+            return dirty_rects
+        rect = profiler.overlay_rect
+        if profiler.overlay_due():
+            old_rect = rect
+            rect = profiler.refresh_overlay(self.fonts['tiny'], fps)
+            if not rect.contains(old_rect):
+                self.invalidate_rect(old_rect)
+                dirty_rects.append(old_rect)
+        elif rect.collidelist(dirty_rects) < 0:
+            return dirty_rects
+        self.screen.blit(profiler.overlay_surface, rect)
+        dirty_rects.append(rect)
+        return dirty_rects
+    
+    def toggle_profiler_overlay(self, fps):
+        profiler = self.profiler
+        profiler.visible = not profiler.visible
+        if profiler.visible:
+            profiler.refresh_overlay(self.fonts['tiny'], fps)
+            self.screen.blit(profiler.overlay_surface, profiler.overlay_rect)
+            pygame.display.update(profiler.overlay_rect)
+        elif profiler.overlay_rect is not None:
+            self.invalidate_rect(profiler.overlay_rect)
+            pygame.display.update(profiler.overlay_rect)
+    
+    def handle_ack(self, ack):
+        """Server confirmed a command: report the round trip"""
+        sent = self.unacked_commands.pop(ack.get('id'), None)
+        if sent is not None:
+            event, sent_at = sent
+            # Timed now, not when the receive started: the command may have been sent since
+            round_trip = (time.time() - sent_at) * 1000
+            if ack.get('status', 'ok') == 'ok':
+                self.add_event_message(f"{event} acknowledged ({round_trip:.0f}ms)", "SUCCESS")
+            else:
+                self.add_event_message(f"{event} rejected by RTOS ({round_trip:.0f}ms)", "DANGER")
+    
     def send_command(self, event, data=None):
         """Send command to RTOS server"""
         if not self.connected or self.rtos_socket is None:
             self.add_event_message(f"Cannot send {event}: Not connected", "DANGER")
             return False
             
-        command = {'event': event}
+        # The id makes the server acknowledge the command, see handle_ack
+        self.command_id += 1
+        command = {'event': event, 'id': self.command_id}
         if data:
             command['data'] = data
             
+        # Recorded before sending so an ACK handled by the comm thread always finds it
+        self.unacked_commands[self.command_id] = (event, time.time())
         try:
-            self.rtos_socket.send(json.dumps(command).encode())
+            self.rtos_socket.sendall((json.dumps(command) + "\n").encode())
             self.add_event_message(f"Sent: {event}", "INFO")
             return True
         except Exception as e:
+            self.unacked_commands.pop(self.command_id, None)
             self.add_event_message(f"Failed to send {event}: {e}", "DANGER")
             self.connected = False
             return False
@@ -527,11 +687,21 @@ class AdvancedTrafficVisualization:
         print("\n🌈 Visualization with WEATHER ready!")
         print("   Press W to cycle through weather effects")
         
+        # Window was uncovered or restored: the retained frame on screen is gone
+        expose_events = {getattr(pygame, name) for name in ('VIDEOEXPOSE', 'WINDOWEXPOSED', 'WINDOWRESTORED')
+                         if hasattr(pygame, name)}
+        
+        profiler = self.profiler
         while running:
+            profiler.begin_frame()
+            
             # Handle events
+            started = time.perf_counter()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in expose_events:
+                    self.force_full_redraw = True
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
                         running = False
@@ -548,51 +718,27 @@ class AdvancedTrafficVisualization:
                         print(f"🌤️  Requesting weather: {weathers[next_index]}")
                     elif event.key == pygame.K_r:
                         self.send_command('RESET_METRICS')
+                    elif event.key == pygame.K_F3:
+                        self.toggle_profiler_overlay(clock.get_fps())
+                    elif event.key == pygame.K_F4:
+                        profiler.toggle_recording(self.profile_path)
+            profiler.add('events', started)
             
-            # Clear screen with WEATHER COLOR
-            bg_color = self.get_background_color()
-            self.screen.fill(bg_color)
-            
-            # Update and draw weather particles
-            self.update_weather_particles()
-            self.draw_weather_particles(self.screen)
-            
-            # Draw all panels (semi-transparent)
-            for panel_name, panel_info in self.panels.items():
-                self.draw_panel(self.screen, panel_info['rect'], panel_info['title'])
-            
-            # Draw panel contents
-            emergency = self.rtos_state.get('emergency', False)
+            # Draw only the panels whose data changed and push just those rects
+            started = time.perf_counter()
+            dirty_rects = self.render_frame()
+            profiler.add('render', started)
             
-            # Intersections
-            self.draw_intersection(self.screen, self.panels['intersection1']['rect'], 
-                                 self.rtos_state.get('lights', {}), emergency)
-            self.draw_intersection(self.screen, self.panels['intersection2']['rect'], 
-                                 self.rtos_state.get('lights', {}), emergency)
+            started = time.perf_counter()
+            dirty_rects = self.update_profiler_overlay(dirty_rects, clock.get_fps())
+            profiler.add('overlay', started)
             
-            # RTOS Tasks
-            tasks = self.rtos_state.get('tasks', {})
-            self.draw_rtos_tasks(self.screen, self.panels['rtos_tasks']['rect'], tasks)
+            started = time.perf_counter()
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+            profiler.add('display', started)
             
-            # Performance Metrics
-            metrics = self.rtos_state.get('metrics', {})
-            self.draw_performance_metrics(self.screen, self.panels['performance']['rect'], metrics)
-            
-            # Event Log
-            self.draw_event_log(self.screen, self.panels['events']['rect'])
-            
-            # Sensors
-            sensors = self.rtos_state.get('sensors', {})
-            self.draw_sensors(self.screen, self.panels['sensors']['rect'], sensors)
-            
-            # Controls
-            self.draw_controls(self.screen, self.panels['controls']['rect'])
-            
-            # Status
-            self.draw_status(self.screen, self.panels['status']['rect'], self.rtos_state)
-            
-            # Update display
-            pygame.display.flip()
+            profiler.end_frame()
             clock.tick(60)  # 60 FPS
         
         # Cleanup
@@ -602,6 +748,11 @@ class AdvancedTrafficVisualization:
             except:
                 pass
         pygame.quit()
+        self.profiler.close()
+        frame = self.profiler.summary()['frame']
+        print(f"⏱️  Frame time p50 {frame['p50']}ms, p95 {frame['p95']}ms, max {frame['max']}ms")
+        stats = self.text.stats()
+        print(f"🔤 Text cache: {stats['hit_rate']}% hits, {stats['misses']} renders, {stats['evictions']} evictions")
         print("\n👋 Visualization stopped")
 
 if __name__ == "__main__":
@@ -612,5 +763,17 @@ if __name__ == "__main__":
     print("   Command: python robust_advanced_server.py")
     print("="*60)
     
-    viz = AdvancedTrafficVisualization()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="RTOS traffic visualization")
+    parser.add_argument("--stream", choices=["full", "delta"], default="full",
+                        help="state stream mode to request from the RTOS server")
+    parser.add_argument("--format", choices=["json", "binary"], default="json",
+                        help="wire format to negotiate with the RTOS server")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="record per-frame phase timing to FILE from the start (F4 toggles)")
+    args = parser.parse_args()
+    
+    viz = AdvancedTrafficVisualization(stream_mode=args.stream, wire_format=args.format,
+                                       profile_path=args.profile)
     viz.run()
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+WEATHER PARTICLES - Fixed-size NumPy particle pool drawn from pre-rendered sprites
+"""
+import numpy as np
+import pygame
+
+# Spawn rate (particles/s), velocity ranges (px/s) and sprites per weather.
+# The initial burst fills the screen at once so a change of weather is visible immediately.
+WEATHER_PROFILES = {
+    "RAIN": {"rate": 900.0, "burst": 1200, "vx": (0.0, 0.0), "vy": (480.0, 720.0), "static": False},
+    "SNOW": {"rate": 250.0, "burst": 900, "vx": (-60.0, 60.0), "vy": (90.0, 180.0), "static": False},
+    "FOG": {"rate": 0.0, "burst": 30, "vx": (0.0, 0.0), "vy": (0.0, 0.0), "static": True},
+}
+FOG_SIZES = (20, 26, 32, 38, 44, 49)
+
+
+def build_sprites():
+    """Every sprite is rendered once; drawing is then just blits"""
+    rain = pygame.Surface((2, 10), pygame.SRCALPHA)
+    rain.fill((100, 150, 255))
+    snow = pygame.Surface((7, 7), pygame.SRCALPHA)
+    pygame.draw.circle(snow, (255, 255, 255), (3, 3), 3)
+    fog = []
+    for size in FOG_SIZES:
+        blob = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(blob, (255, 255, 255, 50), (size // 2, size // 2), size // 2)
+        fog.append(blob)
+    return {"RAIN": [rain], "SNOW": [snow], "FOG": fog}
+
+
+class WeatherParticles:
+    """Positions and velocities live in preallocated arrays; dead slots are reused, never freed
+
+    update() moves every particle with one vectorized step and culls with a mask, spawning into
+    free slots only. draw() hands the visible particles to Surface.blits in a single call.
+    """
+
+    def __init__(self, width=1400, height=900, capacity=4000, seed=None):
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.sprite = np.zeros(capacity, dtype=np.int8)  # Index into the weather's sprite list
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.sprites = build_sprites()
+        self.weather = "CLEAR"
+        self.profile = None
+        self.generation = 0     # Bumped on every weather change, for caches of static particles
+        self.spawn_debt = 0.0   # Fractional particles carried to the next update
+        self.dropped = 0        # Spawns that found the pool full
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    @property
+    def static(self):
+        """True when the particles never move (fog), so they can be baked into a cached layer"""
+        return self.profile is not None and self.profile["static"]
+
+    @property
+    def moving(self):
+        return self.profile is not None and not self.profile["static"] and bool(self.alive.any())
+
+    def set_weather(self, weather):
+        """Empty the pool and start the new weather with its initial burst"""
+        self.weather = weather
+        self.profile = WEATHER_PROFILES.get(weather)
+        self.generation += 1
+        self.alive[:] = False
+        self.spawn_debt = 0.0
+        if self.profile is not None:
+            if self.profile["static"]:
+                self.spawn(self.profile["burst"], self.rng.uniform(0, self.width, self.profile["burst"]),
+                           self.rng.uniform(100, 700, self.profile["burst"]))
+            else:
+                # Spread over the screen height and above it, so the first frames are not empty
+                self.spawn(self.profile["burst"], None,
+                           self.rng.uniform(-self.height, self.height, self.profile["burst"]))
+
+    def spawn(self, count, x=None, y=None):
+        free = np.flatnonzero(~self.alive)[:count]
+        self.dropped += count - len(free)
+        count = len(free)
+        if count == 0:
+            return
+        rng = self.rng
+        profile = self.profile
+        self.x[free] = rng.uniform(0, self.width, count) if x is None else x[:count]
+        self.y[free] = -10.0 if y is None else y[:count]
+        self.vx[free] = rng.uniform(*profile["vx"], count)
+        self.vy[free] = rng.uniform(*profile["vy"], count)
+        self.sprite[free] = rng.integers(0, len(self.sprites[self.weather]), count)
+        self.alive[free] = True
+
+    def update(self, dt):
+        """Advance by dt seconds, cull what left the screen and spawn replacements"""
+        profile = self.profile
+        if profile is None or profile["static"]:
+            return
+        alive = self.alive
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        alive &= (self.y <= self.height) & (self.x >= -10) & (self.x <= self.width + 10)
+
+        self.spawn_debt += profile["rate"] * dt
+        count = int(self.spawn_debt)
+        if count:
+            self.spawn_debt -= count
+            self.spawn(count)
+
+    def draw(self, surface):
+        """Blit every live particle's sprite in one Surface.blits call"""
+        if self.profile is None:
+            return
+        index = np.flatnonzero(self.alive)
+        if len(index) == 0:
+            return
+        sprites = self.sprites[self.weather]
+        xs = self.x[index].astype(np.int32).tolist()
+        ys = self.y[index].astype(np.int32).tolist()
+        if len(sprites) == 1:
+            sprite = sprites[0]
+            surface.blits([(sprite, (x, y)) for x, y in zip(xs, ys)], doreturn=False)
+        else:
+            kinds = self.sprite[index].tolist()
+            surface.blits([(sprites[k], (x, y)) for k, x, y in zip(kinds, xs, ys)], doreturn=False)
@@ -0,0 +1,319 @@
+"""
+LOAD BENCHMARK - N synthetic clients against the event-loop server, results saved as JSON
+"""
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import selectors
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python_simulator"))
+from state_stream import DeltaStateStream, FrameReader  # noqa: E402  (client-side decoders)
+
+WEATHERS = ["CLEAR", "RAIN", "FOG", "SNOW"]
+EFFECT_TIMEOUT = 2.0  # Seconds before a command's effect counts as unobserved
+
+
+def serve(port_queue, result_queue, stop_event, policy, tick_rate):
+    """Server process: RobustRTOS behind EventLoopServer, reports its own CPU time when stopped"""
+    from rtos_server_advanced import RobustRTOS
+    from event_server import EventLoopServer
+    import threading
+
+    with contextlib.redirect_stdout(io.StringIO()):  # Per-client connect messages would swamp the report
+        rtos = RobustRTOS(policy=policy, tick_rate=tick_rate)
+        server = EventLoopServer(rtos, host="127.0.0.1", port=0, max_clients=100000)
+        server.start()
+        port_queue.put(server.port)
+        threading.Thread(target=lambda: (stop_event.wait(), server.stop()), daemon=True).start()
+        cpu_started = time.process_time()
+        misses_started = rtos.metrics["deadline_misses"]
+        server.serve_forever()
+    result_queue.put({
+        "cpu_seconds": time.process_time() - cpu_started,
+        "deadline_misses": rtos.metrics["deadline_misses"] - misses_started,
+        "emergency_deadline_misses": rtos.emergency_deadline_misses,
+        "worst_emergency_ms": round(rtos.worst_emergency_response, 3),
+        "timing": rtos.ticker.stats(),
+        "commands": server.command_stats(),
+    })
+
+
+class SyntheticClient:
+    """One non-blocking connection that subscribes, sends commands and watches for their effects
+
+    Every command carries an id. Its ACK names the last state published before it was applied, so
+    the first state with a higher seq is the one that shows this client's command, whether or not
+    the visible state changed (an emergency may already be latched by another client).
+    """
+
+    def __init__(self, sock, rates, rng, stream_mode, wire_format):
+        self.sock = sock
+        self.rates = rates  # Commands per second by event name
+        self.rng = rng
+        self.reader = FrameReader()
+        self.stream = DeltaStateStream()
+        self.resync_sent = False
+        self.state = None
+        self.pending = {}  # command id -> (event, sent_at, seq from its ACK or None until acked)
+        self.command_id = 0
+        self.next_send = {event: self._next_time(time.perf_counter(), rate) for event, rate in rates.items()}
+        self.frames = 0
+        self.bytes_in = 0
+        self.latencies = {event: [] for event in rates}
+        self.unobserved = {event: 0 for event in rates}
+        self.rejected = {event: 0 for event in rates}
+        if stream_mode != "full" or wire_format != "json":
+            self.send({"event": "SUBSCRIBE", "data": {"mode": stream_mode, "format": wire_format}})
+
+    def _next_time(self, now, rate):
+        return now + self.rng.expovariate(rate) if rate > 0 else float("inf")
+
+    def send(self, cmd):
+        self.sock.sendall((json.dumps(cmd) + "\n").encode())
+
+    def on_readable(self):
+        try:
+            data = self.sock.recv(262144)
+        except (BlockingIOError, InterruptedError):
+            return True
+        if not data:
+            return False
+        now = time.perf_counter()
+        self.bytes_in += len(data)
+        for frame in self.reader.feed(data):
+            if frame.get("type") == "ACK":
+                self.on_ack(frame)
+                continue
+            state = self.stream.apply(frame)
+            if state is None:
+                # A delta after a gap asks for a keyframe once
+                if frame.get("type") == "DELTA" and not self.resync_sent:
+                    self.send({"event": "RESYNC"})
+                    self.resync_sent = True
+                continue
+            self.resync_sent = False
+            self.frames += 1
+            self.state = state
+            # Full and binary states carry their seq, keyframes and deltas leave it in the stream
+            seq = state.get("seq", self.stream.seq)
+            for command_id, (event, sent_at, applied_after) in list(self.pending.items()):
+                if applied_after is not None and seq is not None and seq > applied_after:
+                    self.latencies[event].append((now - sent_at) * 1000)
+                    del self.pending[command_id]
+        return True
+
+    def on_ack(self, ack):
+        sent = self.pending.get(ack.get("id"))
+        if sent is None:
+            return
+        event, sent_at, _ = sent
+        if ack.get("status") != "ok" or ack.get("seq") is None:
+            self.rejected[event] += 1
+            del self.pending[ack["id"]]
+            return
+        self.pending[ack["id"]] = (event, sent_at, ack["seq"])
+
+    def maybe_send(self, now):
+        for command_id, (event, sent_at, _) in list(self.pending.items()):
+            if now - sent_at > EFFECT_TIMEOUT:
+                self.unobserved[event] += 1
+                del self.pending[command_id]
+        if self.state is None:
+            return
+        outstanding = {event for event, _, _ in self.pending.values()}
+        for event, due in self.next_send.items():
+            if now < due or event in outstanding:
+                continue
+            self.next_send[event] = self._next_time(now, self.rates[event])
+            self.command_id += 1
+            cmd = {"event": event, "id": self.command_id}
+            if event == "CHANGE_WEATHER":
+                before = self.state.get("weather")
+                cmd["data"] = {"weather": self.rng.choice([w for w in WEATHERS if w != before])}
+            self.pending[self.command_id] = (event, time.perf_counter(), None)
+            self.send(cmd)
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+            "max": round(ordered[-1], 3), "mean": round(sum(ordered) / len(ordered), 3)}
+
+
+def run_clients(host, port, args):
+    """Drive every client from one selector until the duration is up"""
+    rng = random.Random(args.seed)
+    rates = {"EMERGENCY": args.emergency_rate, "PEDESTRIAN": args.pedestrian_rate,
+             "CHANGE_WEATHER": args.weather_rate}
+    selector = selectors.DefaultSelector()
+    clients = []
+    for _ in range(args.clients):
+        sock = socket.create_connection((host, port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = SyntheticClient(sock, rates, random.Random(rng.random()), args.stream, args.format)
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, data=client)
+        clients.append(client)
+
+    started = time.perf_counter()
+    end = started + args.duration
+    disconnected = 0
+    while True:
+        now = time.perf_counter()
+        if now >= end:
+            break
+        for key, _ in selector.select(min(0.01, end - now)):
+            client = key.data
+            if not client.on_readable():
+                selector.unregister(client.sock)
+                disconnected += 1
+        now = time.perf_counter()
+        for client in clients:
+            client.maybe_send(now)
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        client.sock.close()
+    selector.close()
+    return clients, elapsed, disconnected
+
+
+def summarize(clients, elapsed, disconnected, server, args):
+    frames = sum(client.frames for client in clients)
+    per_client = [client.frames / elapsed for client in clients]
+    result = {
+        "config": {
+            "clients": args.clients, "duration_s": args.duration, "stream": args.stream,
+            "format": args.format, "tick_rate": args.tick_rate, "policy": args.policy,
+            "rates_per_client": {"EMERGENCY": args.emergency_rate, "PEDESTRIAN": args.pedestrian_rate,
+                                 "CHANGE_WEATHER": args.weather_rate},
+        },
+        "throughput": {
+            "frames_per_s": round(frames / elapsed, 1),
+            "bytes_per_s": round(sum(client.bytes_in for client in clients) / elapsed, 1),
+            "min_client_fps": round(min(per_client), 2) if per_client else 0.0,
+            "disconnected": disconnected,
+            "delta_gaps": sum(client.stream.gaps for client in clients),
+        },
+        "latency_ms": {},
+    }
+    for event in ("EMERGENCY", "PEDESTRIAN", "CHANGE_WEATHER"):
+        samples = [value for client in clients for value in client.latencies[event]]
+        result["latency_ms"][event] = percentiles(samples)
+        result["latency_ms"][event]["unobserved"] = sum(client.unobserved[event] for client in clients)
+        result["latency_ms"][event]["rejected"] = sum(client.rejected[event] for client in clients)
+    if server is not None:
+        cpu_percent = server["cpu_seconds"] / elapsed * 100
+        result["server"] = {
+            "cpu_percent": round(cpu_percent, 2),
+            "cpu_percent_per_client": round(cpu_percent / max(1, args.clients), 4),
+            "deadline_misses": server["deadline_misses"],
+            "emergency_deadline_misses": server["emergency_deadline_misses"],
+            "worst_emergency_ms": server["worst_emergency_ms"],
+            "tick_timing": server["timing"],
+            "commands": server["commands"],
+        }
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """Print metrics that moved the wrong way by more than tolerance (fraction)"""
+    checks = [
+        (("throughput", "frames_per_s"), True),
+        (("latency_ms", "EMERGENCY", "p99"), False),
+        (("latency_ms", "CHANGE_WEATHER", "p99"), False),
+        (("server", "cpu_percent_per_client"), False),
+        (("server", "deadline_misses"), False),
+    ]
+    regressions = 0
+    for path, higher_is_better in checks:
+        new, old = result, baseline
+        for key in path:
+            new = new.get(key, {}) if isinstance(new, dict) else None
+            old = old.get(key, {}) if isinstance(old, dict) else None
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        change = (new - old) / old if old else (1.0 if new else 0.0)
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        marker = "❌" if worse else "✅"
+        regressions += worse
+        print(f"   {marker} {'.'.join(path)}: {old} -> {new} ({change * 100:+.1f}%)")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test the controller protocol with synthetic clients")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--stream", choices=["full", "delta"], default="full")
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument("--emergency-rate", type=float, default=0.02, help="per client, per second")
+    parser.add_argument("--pedestrian-rate", type=float, default=0.05, help="per client, per second")
+    parser.add_argument("--weather-rate", type=float, default=0.1, help="per client, per second")
+    parser.add_argument("--tick-rate", type=float, default=10.0)
+    parser.add_argument("--policy", choices=["fp", "rm", "edf"], default="fp")
+    parser.add_argument("--host", help="benchmark an already running server instead (no server CPU figures)")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (fraction)")
+    args = parser.parse_args()
+
+    server_process = None
+    if args.host:
+        host, port = args.host, args.port
+    else:
+        port_queue, result_queue = multiprocessing.Queue(), multiprocessing.Queue()
+        stop_event = multiprocessing.Event()
+        server_process = multiprocessing.Process(
+            target=serve, args=(port_queue, result_queue, stop_event, args.policy, args.tick_rate))
+        server_process.start()
+        host, port = "127.0.0.1", port_queue.get(timeout=30)
+
+    print(f"🏋️ {args.clients} clients x {args.duration:.0f}s against {host}:{port} "
+          f"({args.stream}/{args.format})")
+    clients, elapsed, disconnected = run_clients(host, port, args)
+
+    server = None
+    if server_process is not None:
+        stop_event.set()
+        server = result_queue.get(timeout=30)
+        server_process.join(10)
+
+    result = summarize(clients, elapsed, disconnected, server, args)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"📨 {result['throughput']['frames_per_s']:.0f} frames/s "
+          f"(slowest client {result['throughput']['min_client_fps']} fps)")
+    for event, stats in result["latency_ms"].items():
+        if stats["count"]:
+            print(f"⏱️  {event}: p50 {stats['p50']}ms p99 {stats['p99']}ms max {stats['max']}ms "
+                  f"({stats['count']} seen, {stats['unobserved']} unobserved)")
+    if server is not None:
+        print(f"🖥️  Server CPU {result['server']['cpu_percent']}% "
+              f"({result['server']['cpu_percent_per_client']}% per client), "
+              f"deadline misses {result['server']['deadline_misses']}")
+    print(f"📄 Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"📊 Compared with {args.baseline}:")
+        if compare(result, baseline, args.tolerance):
+            sys.exit(1)
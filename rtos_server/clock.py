@@ -0,0 +1,44 @@
+"""
+CLOCKS - Every time-dependent controller path reads time through one of these
+"""
+import time
+
+
+class SystemClock:
+    """Real time: monotonic for intervals, wall clock for timestamps"""
+    virtual = False
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """Simulated time that only moves when advanced, as fast as the CPU allows"""
+    virtual = True
+
+    def __init__(self, start_time=None):
+        self.epoch = time.time() if start_time is None else start_time  # Wall time at t=0
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+    def advance_to(self, instant):
+        if instant > self.now:
+            self.now = instant
+
+    sleep = advance
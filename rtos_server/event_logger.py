@@ -0,0 +1,164 @@
+"""
+EVENT LOGGER - Batched traffic_log.csv writer on a background thread
+"""
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Column layout read by python_simulator/analyze_data.py
+COLUMNS = ["timestamp", "event_type", "lights_NS", "lights_EW", "emergency", "vehicle_count",
+           "avg_wait_time", "response_time_ms", "weather", "task_states"]
+
+_STOP = object()
+
+
+class EventLogger:
+    """The control path only enqueues raw values; formatting and disk I/O happen on the writer thread"""
+
+    def __init__(self, path="logs/traffic_log.csv", max_queue=10000, batch_size=256, flush_interval=1.0,
+                 max_bytes=10 * 1024 * 1024, rotate_interval=None, backups=5):
+        self.path = path
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes                # Rotate once the file reaches this size
+        self.rotate_interval = rotate_interval    # ...or after this many seconds, if set
+        self.backups = backups
+        self.thread = None
+        self.file = None
+        self.writer = None
+        self.opened_at = 0.0
+        self.file_rows = 0
+
+        # Counters, only the control path touches dropped
+        self.logged = 0
+        self.dropped = {}
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+
+    def start(self):
+        self._open()
+        self.thread = threading.Thread(target=self._run, name="event-logger", daemon=True)
+        self.thread.start()
+        return self
+
+    def log(self, timestamp, event_type, lights_ns, lights_ew, emergency, vehicle_count,
+            avg_wait_time, response_time_ms, weather, task_states):
+        """Queue one row without blocking. Returns False if the queue was full and the row dropped"""
+        try:
+            self.queue.put_nowait((timestamp, event_type, lights_ns, lights_ew, emergency, vehicle_count,
+                                   avg_wait_time, response_time_ms, weather, task_states))
+        except queue.Full:
+            self.dropped[event_type] = self.dropped.get(event_type, 0) + 1
+            return False
+        self.logged += 1
+        return True
+
+    def stop(self, timeout=5.0):
+        """Write everything still queued, then close the file"""
+        if self.thread is None:
+            return
+        self.queue.put(_STOP, timeout=timeout)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def stats(self):
+        return {
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": sum(self.dropped.values()),
+            "dropped_by_type": dict(self.dropped),
+            "queued": self.queue.qsize(),
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_rotate()
+                continue
+
+            # Drain whatever else is waiting into the same batch
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+            self._maybe_rotate()
+        self._close()
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        rows = []
+        for (timestamp, event_type, lights_ns, lights_ew, emergency, vehicle_count,
+             avg_wait_time, response_time_ms, weather, task_states) in batch:
+            rows.append([
+                datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                event_type, lights_ns, lights_ew, emergency, vehicle_count,
+                avg_wait_time, response_time_ms, weather, json.dumps(task_states),
+            ])
+        try:
+            self.writer.writerows(rows)
+            self.file.flush()
+        except OSError as e:
+            self.write_errors += 1
+            print(f"⚠️  Event log write failed: {e}")
+            return
+        self.written += len(rows)
+        self.file_rows += len(rows)
+        self.batches += 1
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(COLUMNS)
+        self.opened_at = time.monotonic()
+        self.file_rows = 0
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _maybe_rotate(self):
+        if not self.file_rows:
+            return  # Never rotate out a file with nothing new in it
+        too_big = self.max_bytes and self.file.tell() >= self.max_bytes
+        too_old = self.rotate_interval and time.monotonic() - self.opened_at >= self.rotate_interval
+        if not (too_big or too_old):
+            return
+        self._close()
+        # traffic_log.csv -> traffic_log.1.csv -> traffic_log.2.csv ... oldest is deleted
+        base, ext = os.path.splitext(self.path)
+        for index in range(self.backups, 0, -1):
+            source = self.path if index == 1 else f"{base}.{index - 1}{ext}"
+            if os.path.exists(source):
+                os.replace(source, f"{base}.{index}{ext}")
+        if not self.backups:
+            os.remove(self.path)
+        self.rotations += 1
+        self._open()
@@ -0,0 +1,499 @@
+"""
+EVENT-LOOP RTOS SERVER - Serves many visualizations from one thread
+"""
+import selectors
+import socket
+import time
+from collections import deque
+from protocol import (MODE_FULL, MODE_DELTA, STREAM_MODES, FORMAT_JSON, FORMAT_BINARY,
+                      WIRE_FORMATS, BinaryStateCodec, CommandDecoder, encode_ack, encode_keyframe,
+                      encode_delta)
+from instrumentation import Histogram
+
+
+class ClientConnection:
+    """Per-client socket with its own read buffer and bounded, conflating write queue
+
+    Control messages (handshakes, command acks) are queued in order and never dropped. State
+    frames are latest-wins: only the newest frame that has not started sending is kept.
+    """
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.fd = sock.fileno()
+        self.decoder = CommandDecoder()
+        self.control_queue = deque()
+        self.control_bytes = 0
+        self.pending_state = None  # Newest unsent state frame, replaced rather than queued behind
+        self.in_flight = None      # Frame currently being written, always finished first
+        self.in_flight_is_state = False
+        self.write_offset = 0      # Bytes of in_flight already sent
+        self.connected_at = time.time()
+        self.bytes_out = 0
+        self.watching_write = False
+        self.stream_mode = MODE_FULL
+        self.wire_format = FORMAT_JSON
+        self.needs_keyframe = True
+
+        # Lag metrics
+        self.frames_sent = 0
+        self.conflated = 0      # State frames replaced before they were sent
+        self.lag_ticks = 0      # Consecutive frames that found an older one still unsent
+        self.max_lag_ticks = 0
+
+    def queue(self, payload):
+        """Queue a control message; these are never dropped"""
+        self.control_queue.append(payload)
+        self.control_bytes += len(payload)
+
+    def queue_state(self, payload):
+        """Queue a state frame, replacing any older one that has not started sending"""
+        if self.pending_state is not None:
+            self.conflated += 1
+        if self.pending_state is not None or self.in_flight_is_state:
+            self.lag_ticks += 1
+            self.max_lag_ticks = max(self.max_lag_ticks, self.lag_ticks)
+        else:
+            self.lag_ticks = 0
+        self.pending_state = payload
+
+    def state_pending(self):
+        return self.pending_state is not None
+
+    def drop_pending_state(self):
+        self.pending_state = None
+
+    def has_pending(self):
+        return self.in_flight is not None or bool(self.control_queue) or self.pending_state is not None
+
+    def queued_bytes(self):
+        in_flight = len(self.in_flight) - self.write_offset if self.in_flight is not None else 0
+        pending = len(self.pending_state) if self.pending_state is not None else 0
+        return in_flight + self.control_bytes + pending
+
+    def read(self):
+        """Read whatever is available. Returns None when the peer closed"""
+        try:
+            data = self.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return []
+        if not data:
+            return None
+        return self.decoder.feed(data)
+
+    def _next_payload(self):
+        # Control first so acks are not stuck behind state frames
+        if self.control_queue:
+            payload = self.control_queue.popleft()
+            self.control_bytes -= len(payload)
+            self.in_flight_is_state = False
+            return payload
+        payload, self.pending_state = self.pending_state, None
+        self.in_flight_is_state = payload is not None
+        return payload
+
+    def flush(self):
+        """Send as much queued data as the socket accepts without blocking"""
+        while True:
+            if self.in_flight is None:
+                self.in_flight = self._next_payload()
+                self.write_offset = 0
+                if self.in_flight is None:
+                    return
+            try:
+                sent = self.sock.send(memoryview(self.in_flight)[self.write_offset:])
+            except (BlockingIOError, InterruptedError):
+                return
+            self.bytes_out += sent
+            self.write_offset += sent
+            if self.write_offset < len(self.in_flight):
+                return  # Kernel buffer full, wait for EVENT_WRITE
+            if self.in_flight_is_state:
+                self.frames_sent += 1
+                self.lag_ticks = 0
+            self.in_flight = None
+            self.in_flight_is_state = False
+
+    def lag_stats(self):
+        return {
+            "addr": f"{self.addr[0]}:{self.addr[1]}",
+            "lag_ticks": self.lag_ticks,
+            "max_lag_ticks": self.max_lag_ticks,
+            "conflated": self.conflated,
+            "queued_bytes": self.queued_bytes(),
+            "frames_sent": self.frames_sent,
+            "bytes_out": self.bytes_out,
+        }
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionStats:
+    """Traffic, command and latency counters over live and closed connections
+
+    The event loop and the legacy single-client loop both keep one, so they export the same metrics.
+    """
+
+    def __init__(self):
+        self.clients = {}  # fileno -> ClientConnection
+        self.lagged_out = 0
+        # Decoder counters carried over from clients that have disconnected
+        self.closed_command_stats = {"commands": 0, "malformed": 0, "overflows": 0}
+        self.closed_traffic = {"frames_sent": 0, "bytes_out": 0, "conflated": 0}
+        self.command_latency = {}  # event -> Histogram of receipt-to-applied time (ms)
+
+    def retire(self, conn):
+        """Fold a closed connection's counters into the totals"""
+        for name in self.closed_command_stats:
+            self.closed_command_stats[name] += getattr(conn.decoder, name)
+        for name in self.closed_traffic:
+            self.closed_traffic[name] += getattr(conn, name)
+
+    def observe_latency(self, cmd, received_at):
+        event = str(cmd.get('event', '')).upper() or "UNKNOWN"
+        hist = self.command_latency.get(event)
+        if hist is None:
+            if len(self.command_latency) >= 32:
+                event = "OTHER"  # Clients choose event names, keep the label set bounded
+                hist = self.command_latency.get(event)
+            if hist is None:
+                hist = self.command_latency[event] = Histogram()
+        hist.observe((time.perf_counter() - received_at) * 1000)
+
+    def command_stats(self):
+        """Commands decoded, malformed frames and buffer overflows across all connections"""
+        stats = dict(self.closed_command_stats)
+        for conn in self.clients.values():
+            for name in stats:
+                stats[name] += getattr(conn.decoder, name)
+        return stats
+
+    def client_stats(self):
+        """Per-client lag: consecutive frames behind, conflated frames, bytes still queued"""
+        return [conn.lag_stats() for conn in self.clients.values()]
+
+    def traffic_totals(self):
+        """Frames and bytes written, and frames conflated, since the server started"""
+        totals = dict(self.closed_traffic)
+        for conn in self.clients.values():
+            for name in totals:
+                totals[name] += getattr(conn, name)
+        return totals
+
+    def lag_summary(self):
+        clients = list(self.clients.values())
+        return {
+            "clients": len(clients),
+            "lagging": sum(1 for conn in clients if conn.lag_ticks),
+            "max_lag_ticks": max((conn.lag_ticks for conn in clients), default=0),
+            "conflated": sum(conn.conflated for conn in clients),
+            "queued_bytes": sum(conn.queued_bytes() for conn in clients),
+            "lagged_out": self.lagged_out,
+        }
+
+
+class EventLoopServer(ConnectionStats):
+    """Single-threaded selectors server multiplexing all connected clients"""
+
+    def __init__(self, rtos, host='0.0.0.0', port=5000, max_clients=512, keyframe_interval=50,
+                 max_lag_ticks=50, max_control_bytes=256 * 1024):
+        super().__init__()
+        self.rtos = rtos
+        self.host = host
+        self.port = port
+        self.ticker = rtos.ticker  # Drift-free tick deadlines shared with the controller
+        self.max_clients = max_clients
+        self.keyframe_interval = keyframe_interval  # Ticks between delta-stream keyframes
+        self.max_lag_ticks = max_lag_ticks          # Frames a client may fall behind before it is dropped
+        self.max_control_bytes = max_control_bytes  # Unread acks allowed before a client is dropped
+        self.last_snapshot = None
+        self.binary_codec = BinaryStateCodec(list(rtos.tasks))
+        self.command_queue = deque()      # Normal lane: (conn, cmd, received_at) handled after emergencies
+        self.external_commands = deque()  # Commands submitted from other threads
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+
+        self.exporter = None       # MetricsExporter refreshed from this loop, off the tick path
+        self.sensor_ingest = getattr(rtos, "sensor_ingest", None)  # UDP readings, drained every pass
+        self.selector = selectors.DefaultSelector()
+        self.server = None
+        self.running = False
+
+    def start(self):
+        """Bind the listening socket and register it with the selector"""
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen(128)
+        self.server.setblocking(False)
+        self.port = self.server.getsockname()[1]
+        self.selector.register(self.server, selectors.EVENT_READ, data=None)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, data=self)
+        if self.sensor_ingest is not None:
+            self.selector.register(self.sensor_ingest.sock, selectors.EVENT_READ, data=self.sensor_ingest)
+        self.running = True
+
+    def serve_forever(self):
+        """Run the event loop until stop() or Ctrl+C"""
+        if self.server is None:
+            self.start()
+
+        ticker = self.ticker
+        try:
+            while self.running:
+                timeout = ticker.time_until_next()
+                for key, mask in self.selector.select(timeout):
+                    if key.data is None:
+                        self._accept()
+                    elif key.data is self:
+                        self._drain_wakeup()
+                    elif key.data is self.sensor_ingest:
+                        self.sensor_ingest.receive()
+                    else:
+                        self._service(key.data, mask)
+
+                # Priority lane: an emergency goes out now, not on the next tick
+                if self.rtos.emergency_pending():
+                    self._broadcast(self.rtos.publish_snapshot())
+                self._dispatch_commands()
+
+                if ticker.due():
+                    ticker.begin()
+                    self._tick()
+                    ticker.end()
+                    if self.exporter is not None:
+                        self.exporter.publish()
+        except KeyboardInterrupt:
+            print("\n🛑 Server shutdown requested")
+        finally:
+            self.close()
+
+    def stop(self):
+        self.running = False
+        self._wake()
+
+    def submit_command(self, cmd):
+        """Thread-safe way to hand the loop a command; wakes it immediately"""
+        self.external_commands.append((cmd, time.perf_counter()))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self.wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # Already pending or closing
+
+    def _drain_wakeup(self):
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self.external_commands:
+            cmd, received_at = self.external_commands.popleft()
+            self._route_command(None, cmd, received_at)
+
+    def close(self):
+        for conn in list(self.clients.values()):
+            self._disconnect(conn, log=False)
+        if self.server is not None:
+            try:
+                self.selector.unregister(self.server)
+            except (KeyError, ValueError):
+                pass
+            self.server.close()
+            self.server = None
+        self.selector.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+        print("👋 Server stopped")
+
+    def _accept(self):
+        try:
+            sock, addr = self.server.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        if len(self.clients) >= self.max_clients:
+            print(f"⚠️  Client limit reached, rejecting {addr}")
+            sock.close()
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = ClientConnection(sock, addr)
+        self.clients[conn.fd] = conn
+        self.selector.register(sock, selectors.EVENT_READ, data=conn)
+        print(f"✅ Visualization connected: {addr} ({len(self.clients)} clients)")
+        self.rtos.log_event("CLIENT_CONNECTED")
+
+    def _service(self, conn, mask):
+        try:
+            if mask & selectors.EVENT_READ:
+                commands = conn.read()
+                received_at = time.perf_counter()
+                if commands is None:
+                    self._disconnect(conn)
+                    return
+                for cmd in commands:
+                    self._route_command(conn, cmd, received_at)
+                if conn.fd not in self.clients:
+                    return
+            if mask & selectors.EVENT_WRITE:
+                conn.flush()
+                self._update_interest(conn)
+        except (ConnectionResetError, BrokenPipeError):
+            self._disconnect(conn)
+        except Exception as e:
+            print(f"⚠️  Communication error with {conn.addr}: {e}")
+            self._disconnect(conn)
+
+    def _route_command(self, conn, cmd, received_at):
+        """Emergencies are applied as soon as they are decoded, the rest wait for this loop pass"""
+        if str(cmd.get('event', '')).upper() == 'EMERGENCY':
+            try:
+                self.rtos.handle_command(cmd, received_at)
+            except Exception as e:
+                self._reject(conn, cmd, e)
+                return
+            self.observe_latency(cmd, received_at)
+            self._ack(conn, cmd)
+        else:
+            self.command_queue.append((conn, cmd, received_at))
+
+    def _dispatch_commands(self):
+        while self.command_queue:
+            conn, cmd, received_at = self.command_queue.popleft()
+            if conn is not None and conn.fd not in self.clients:
+                continue  # Sender went away before its turn
+            try:
+                self._handle_command(conn, cmd)
+            except Exception as e:
+                self._reject(conn, cmd, e)
+                continue
+            self.observe_latency(cmd, received_at)
+
+    def _reject(self, conn, cmd, error):
+        """A command that broke its handler is malformed; the loop and other clients carry on"""
+        source = conn.addr if conn is not None else "local"
+        print(f"⚠️  Rejected command from {source}: {error!r} in {str(cmd)[:80]}")
+        if conn is not None:
+            conn.decoder.malformed += 1
+        else:
+            self.closed_command_stats["malformed"] += 1
+        self._ack(conn, cmd, "error")
+
+    def _handle_command(self, conn, cmd):
+        """Stream control is per connection, everything else goes to the controller"""
+        event = str(cmd.get('event', '')).upper()
+        if conn is not None and event == 'SUBSCRIBE':
+            data = cmd.get('data')
+            if not isinstance(data, dict):
+                data = {}
+            mode = data.get('mode', MODE_FULL)
+            wire_format = data.get('format', FORMAT_JSON)
+            if mode in STREAM_MODES and wire_format in WIRE_FORMATS:
+                conn.stream_mode = mode
+                conn.needs_keyframe = True
+                if wire_format != conn.wire_format:
+                    conn.drop_pending_state()  # Encoded in the old format
+                if wire_format == FORMAT_BINARY and conn.wire_format != FORMAT_BINARY:
+                    # Layout and enum tables go out once, every later frame is binary
+                    conn.queue(self.binary_codec.handshake())
+                conn.wire_format = wire_format
+                print(f"📺 {conn.addr} subscribed with {mode}/{wire_format} stream")
+        elif conn is not None and event == 'RESYNC':
+            conn.needs_keyframe = True
+        else:
+            self.rtos.handle_command(cmd)
+        self._ack(conn, cmd)
+
+    def _ack(self, conn, cmd, status="ok"):
+        """Commands that carry an "id" are acknowledged on the control lane"""
+        if conn is None or "id" not in cmd or conn.fd not in self.clients:
+            return
+        conn.queue(encode_ack(cmd, conn.wire_format, status, self.rtos.snapshot_seq))
+        self._flush(conn)
+
+    def _flush(self, conn):
+        try:
+            conn.flush()
+            self._update_interest(conn)
+        except (ConnectionResetError, BrokenPipeError):
+            self._disconnect(conn)
+        except Exception as e:
+            print(f"⚠️  Communication error with {conn.addr}: {e}")
+            self._disconnect(conn)
+
+    def _tick(self):
+        """Advance the controller once and fan the same frame out to all clients"""
+        self._broadcast(self.rtos.broadcast_tick())
+
+    def _broadcast(self, snapshot):
+        """Queue one snapshot on every connection, encoding each wire variant once"""
+        previous, self.last_snapshot = self.last_snapshot, snapshot
+        keyframe_due = snapshot.seq % self.keyframe_interval == 0 or previous is None
+        keyframe = delta = binary = None
+
+        for conn in list(self.clients.values()):
+            if conn.wire_format == FORMAT_BINARY:
+                # Fixed-layout frames are already smaller than a JSON delta
+                if binary is None:
+                    binary = self.binary_codec.encode(snapshot)
+                payload = binary
+            elif conn.stream_mode == MODE_DELTA:
+                # Replacing an unsent frame breaks the delta chain, so the replacement is a keyframe
+                if conn.state_pending():
+                    conn.needs_keyframe = True
+                # Each variant is encoded at most once per tick, however many clients use it
+                if conn.needs_keyframe or keyframe_due:
+                    if keyframe is None:
+                        keyframe = encode_keyframe(snapshot)
+                    payload = keyframe
+                    conn.needs_keyframe = False
+                else:
+                    if delta is None:
+                        delta = encode_delta(previous, snapshot)
+                    payload = delta
+            else:
+                payload = snapshot.payload
+            conn.queue_state(payload)
+            self._flush(conn)
+            if conn.lag_ticks > self.max_lag_ticks or conn.control_bytes > self.max_control_bytes:
+                print(f"🐢 {conn.addr} fell {conn.lag_ticks} frames behind "
+                      f"({conn.queued_bytes()} bytes queued), disconnecting")
+                self.lagged_out += 1
+                self._disconnect(conn)
+
+        # Emergency latency is measured until the frame has been handed to every socket
+        self.rtos.record_emergency_broadcast()
+
+    def _update_interest(self, conn):
+        """Only watch for writability while data is waiting to go out"""
+        want_write = conn.has_pending()
+        if want_write == conn.watching_write:
+            return
+        events = selectors.EVENT_READ
+        if want_write:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(conn.sock, events, data=conn)
+        conn.watching_write = want_write
+
+    def _disconnect(self, conn, log=True):
+        if self.clients.pop(conn.fd, None) is None:
+            return
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+        self.retire(conn)
+        if log:
+            print(f"📭 Visualization disconnected: {conn.addr} ({len(self.clients)} clients)")
+            if conn.decoder.malformed or conn.decoder.overflows:
+                print(f"⚠️  {conn.addr} sent {conn.decoder.malformed} malformed commands, "
+                      f"{conn.decoder.overflows} buffer overflows")
@@ -0,0 +1,64 @@
+"""
+INSTRUMENTATION - Fixed-bucket histograms for timing measurements
+"""
+from bisect import bisect_left
+
+# Upper bounds in milliseconds, tuned for a 10-100 Hz control loop
+DEFAULT_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 7.5, 10, 12.5, 15, 20, 25, 50,
+                      75, 100, 125, 150, 250, 500, 1000)
+
+
+class Histogram:
+    """Fixed-bucket histogram with constant memory and O(log buckets) observe"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Estimate of the q-th percentile (q in 0..100), interpolated within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        lower = self.min
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                lower = max(lower, self.min)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def summary(self):
+        """Rounded mean/p50/p99/max for publishing"""
+        return {
+            "mean": round(self.mean(), 3),
+            "p50": round(self.percentile(50), 3),
+            "p99": round(self.percentile(99), 3),
+            "max": round(self.max or 0.0, 3),
+        }
@@ -0,0 +1,261 @@
+"""
+METRICS ENDPOINT - Prometheus text exposition on a second port, served from its own thread
+"""
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricFamily:
+    """One metric name with its type, help text and (labels, value) samples"""
+    __slots__ = ("name", "kind", "help", "samples")
+
+    def __init__(self, name, kind, help_text, samples=()):
+        self.name = name
+        self.kind = kind  # counter, gauge or histogram
+        self.help = help_text
+        self.samples = list(samples)
+
+    def add(self, value, **labels):
+        self.samples.append((labels, value))
+        return self
+
+
+def frozen_histogram(hist):
+    """Copy of a Histogram that later observations cannot change"""
+    return (hist.buckets, tuple(hist.counts), hist.sum, hist.count)
+
+
+def histogram_family(name, help_text, hists):
+    """hists is [(labels, Histogram)]; buckets are copied now, on the control thread"""
+    return MetricFamily(name, "histogram", help_text, [(labels, frozen_histogram(hist)) for labels, hist in hists])
+
+
+def _labels(labels, extra=None):
+    items = list(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    text = ",".join(f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                    for key, value in items)
+    return "{" + text + "}"
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+def render(families):
+    """Text exposition format 0.0.4"""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for labels, value in family.samples:
+            if family.kind == "histogram":
+                buckets, counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{family.name}_bucket{_labels(labels, ('le', bound))} {cumulative}")
+                lines.append(f"{family.name}_bucket{_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{family.name}_sum{_labels(labels)} {_number(float(total))}")
+                lines.append(f"{family.name}_count{_labels(labels)} {count}")
+            else:
+                lines.append(f"{family.name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def collect_controller_metrics(rtos, server=None):
+    """Read controller and server state into metric families. Runs on the control thread"""
+    ticker = rtos.ticker
+    families = [
+        histogram_family("rtos_tick_duration_ms", "Time spent in one controller tick",
+                         [({}, ticker.duration_hist)]),
+        histogram_family("rtos_tick_period_ms", "Time between consecutive tick starts",
+                         [({}, ticker.period_hist)]),
+        histogram_family("rtos_tick_jitter_ms", "Tick start minus its scheduled deadline",
+                         [({}, ticker.jitter_hist)]),
+        MetricFamily("rtos_ticks_total", "counter", "Controller ticks run").add(ticker.ticks),
+        MetricFamily("rtos_tick_late_starts_total", "counter", "Ticks that started a period or more late")
+        .add(ticker.late_starts),
+        MetricFamily("rtos_tick_overruns_total", "counter", "Ticks that ran longer than one period")
+        .add(ticker.overruns),
+        MetricFamily("rtos_ticks_skipped_total", "counter", "Tick deadlines dropped after late starts").add(ticker.skipped),
+        histogram_family("rtos_emergency_response_ms", "Emergency receipt to broadcast latency",
+                         [({}, rtos.emergency_hist)]),
+        MetricFamily("rtos_emergency_response_last_ms", "gauge", "Latest emergency response time")
+        .add(rtos.metrics["emergency_response_time"]),
+        MetricFamily("rtos_deadline_misses_total", "counter", "Emergency and scheduler deadline misses")
+        .add(rtos.metrics["deadline_misses"]),
+        MetricFamily("rtos_cpu_utilization_percent", "gauge", "Share of time spent executing jobs")
+        .add(rtos.metrics["cpu_utilization"]),
+        MetricFamily("rtos_vehicle_throughput_per_minute", "gauge", "Vehicles that cleared the junction")
+        .add(rtos.metrics["vehicle_throughput"]),
+        MetricFamily("rtos_vehicle_wait_seconds", "gauge", "Average wait of recent vehicles")
+        .add(rtos.metrics["avg_wait_time"]),
+        MetricFamily("rtos_timer_backlog", "gauge", "Timers scheduled and not yet fired").add(len(rtos.timers)),
+        MetricFamily("rtos_timers_fired_total", "counter", "Timers that have fired").add(rtos.timers.fired),
+        MetricFamily("rtos_emergency_active", "gauge", "1 while an emergency holds the corridor")
+        .add(rtos.emergency),
+        MetricFamily("rtos_snapshots_published_total", "counter", "State versions published")
+        .add(rtos.snapshots.published),
+    ]
+
+    job_misses = MetricFamily("rtos_job_deadline_misses_total", "counter", "Deadline misses per scheduler job")
+    job_runs = MetricFamily("rtos_job_completions_total", "counter", "Completed releases per scheduler job")
+    for job in rtos.scheduler.jobs.values():
+        job_misses.add(job.deadline_misses, job=job.name)
+        job_runs.add(job.completions, job=job.name)
+    families += [job_misses, job_runs,
+                 MetricFamily("rtos_preemptions_total", "counter", "Scheduler preemption points")
+                 .add(rtos.scheduler.preemptions)]
+
+    if rtos.logger is not None:
+        stats = rtos.logger.stats()
+        families += [
+            MetricFamily("rtos_log_events_written_total", "counter", "Event log rows written").add(stats["written"]),
+            MetricFamily("rtos_log_events_dropped_total", "counter", "Event log rows dropped on a full queue")
+            .add(stats["dropped"]),
+        ]
+
+    if rtos.sensor_ingest is not None:
+        stats = rtos.sensor_ingest.stats()
+        families += [
+            MetricFamily("rtos_sensor_datagrams_total", "counter", "Sensor datagrams received")
+            .add(stats["datagrams"]),
+            MetricFamily("rtos_sensor_readings_total", "counter", "Sensor readings received").add(stats["readings"]),
+            MetricFamily("rtos_sensor_sources", "gauge", "Sensor sources reporting recently").add(stats["sources"]),
+            MetricFamily("rtos_sensor_discarded_total", "counter",
+                         "Sensor input discarded; malformed counts datagrams, the rest readings")
+            .add(stats["late"], reason="late").add(stats["lost"], reason="lost")
+            .add(stats["malformed"], reason="malformed").add(stats["overflow"], reason="overflow"),
+        ]
+
+    if server is not None:
+        totals = server.traffic_totals()
+        lag = server.lag_summary()
+        commands = server.command_stats()
+        families += [
+            MetricFamily("rtos_clients_connected", "gauge", "Connected visualizations").add(lag["clients"]),
+            MetricFamily("rtos_clients_lagging", "gauge", "Clients with an unsent older frame").add(lag["lagging"]),
+            MetricFamily("rtos_clients_lagged_out_total", "counter", "Clients disconnected for falling behind")
+            .add(lag["lagged_out"]),
+            MetricFamily("rtos_frames_sent_total", "counter", "State frames written to clients")
+            .add(totals["frames_sent"]),
+            MetricFamily("rtos_frames_conflated_total", "counter", "State frames replaced before sending")
+            .add(totals["conflated"]),
+            MetricFamily("rtos_bytes_out_total", "counter", "Bytes written to clients").add(totals["bytes_out"]),
+            MetricFamily("rtos_send_queue_bytes", "gauge", "Bytes queued for all clients").add(lag["queued_bytes"]),
+            MetricFamily("rtos_commands_total", "counter", "Commands decoded").add(commands["commands"]),
+            MetricFamily("rtos_commands_malformed_total", "counter", "Malformed command frames")
+            .add(commands["malformed"]),
+            histogram_family("rtos_command_latency_ms", "Command receipt until it was applied",
+                             [({"event": event}, hist) for event, hist in sorted(server.command_latency.items())]),
+        ]
+    return families
+
+
+class MetricsExporter:
+    """The control thread publishes a frozen metric set; the HTTP thread only renders the latest one"""
+
+    def __init__(self, collect, host="127.0.0.1", port=9100, interval=1.0, clock=time.monotonic):
+        self.collect = collect  # Callable returning metric families, called on the control thread
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.clock = clock
+        self.current = []  # Swapped by reference, never mutated after publishing
+        self.last_publish = None
+        self.scrapes = 0
+        self.httpd = None
+        self.thread = None
+
+    def publish(self, now=None):
+        """Refresh the published metrics if interval has passed; cheap to call every loop pass"""
+        if now is None:
+            now = self.clock()
+        if self.last_publish is not None and now - self.last_publish < self.interval:
+            return False
+        self.last_publish = now
+        self.current = self.collect()
+        return True
+
+    def render(self):
+        return render(self.current)
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                exporter.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+        self.thread.start()
+        print(f"📈 Metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+def parse_exposition(text):
+    """Minimal scraper-side parser: {(name, ((label, value), ...)): float}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        head, _, value = line.rpartition(" ")
+        name, labels = head, ()
+        if "{" in head:
+            name, _, rest = head.partition("{")
+            pairs = [pair.split("=", 1) for pair in rest.rstrip("}").split('",') if pair]
+            labels = tuple((key, raw.strip('"')) for key, raw in pairs)
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def scrape(url="http://127.0.0.1:9100/metrics", timeout=5.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return parse_exposition(response.read().decode())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape the controller's metrics endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:9100/metrics")
+    parser.add_argument("--grep", default="", help="only show metrics whose name contains this")
+    args = parser.parse_args()
+
+    for (name, labels), value in sorted(scrape(args.url).items()):
+        if args.grep in name:
+            label_text = ",".join(f"{key}={value}" for key, value in labels)
+            print(f"{name}{'{' + label_text + '}' if label_text else ''} = {value:g}")
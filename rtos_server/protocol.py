@@ -0,0 +1,239 @@
+"""
+STATE STREAM PROTOCOL - Keyframe/delta encoding of controller state
+"""
+import json
+import struct
+
+# Stream modes a client can ask for with {"event": "SUBSCRIBE", "data": {"mode": ...}}
+MODE_FULL = "full"      # Every tick sends the complete state (default)
+MODE_DELTA = "delta"    # Keyframe on connect and every K ticks, changed keys otherwise
+STREAM_MODES = (MODE_FULL, MODE_DELTA)
+
+# Wire formats a client can ask for with {"event": "SUBSCRIBE", "data": {"format": ...}}
+FORMAT_JSON = "json"        # Newline-delimited JSON (default)
+FORMAT_BINARY = "binary"    # Fixed-layout struct frames, layout sent once at handshake
+WIRE_FORMATS = (FORMAT_JSON, FORMAT_BINARY)
+
+# Enum tables shared with binary clients at handshake
+ENUMS = {
+    "light": ["RED", "YELLOW", "GREEN"],
+    "weather": ["CLEAR", "RAIN", "FOG", "SNOW"],
+    "task_state": ["RUNNING", "READY", "BLOCKED", "SUSPENDED"],
+    "time_of_day": ["DAY", "NIGHT"],
+}
+UNKNOWN_ENUM = 255
+
+# Binary fields saturate at the limits of their struct code instead of failing the frame
+FIELD_LIMITS = {
+    "B": (0, 0xFF),
+    "H": (0, 0xFFFF),
+    "I": (0, 0xFFFFFFFF),
+    "f": (-3.4028234663852886e38, 3.4028234663852886e38),
+}
+
+# Binary frame: <u16 length of everything after it> <u8 kind> <u32 seq> <body>
+FRAME_HEADER = struct.Struct("<HBI")
+FRAME_STATE = 1
+FRAME_ACK = 2    # Body is the JSON ack object, seq is 0
+
+
+class CommandDecoder:
+    """Reassembles newline-delimited JSON commands from arbitrary recv() chunks"""
+
+    def __init__(self, max_buffer=65536):
+        self.buffer = bytearray()
+        self.scan_from = 0  # Bytes already searched for a newline
+        self.max_buffer = max_buffer
+        self.commands = 0
+        self.malformed = 0
+        self.overflows = 0
+
+    def feed(self, data):
+        """Add received bytes and return every complete command, in arrival order"""
+        buffer = self.buffer
+        buffer.extend(data)
+        commands = []
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", max(start, self.scan_from))
+            if newline < 0:
+                break
+            self._decode(bytes(buffer[start:newline]), commands)
+            start = newline + 1
+        if start:
+            del buffer[:start]
+        self.scan_from = len(buffer)
+
+        # Older clients send one unterminated object per send(); only try when it looks complete
+        if buffer and buffer.rstrip().endswith(b"}"):
+            self._decode_unterminated(commands)
+
+        if len(buffer) > self.max_buffer:
+            self.overflows += 1
+            buffer.clear()
+            self.scan_from = 0
+        return commands
+
+    def _decode(self, line, commands):
+        if not line.strip():
+            return
+        try:
+            cmd = json.loads(line)
+        except ValueError:
+            self.malformed += 1
+            return
+        if isinstance(cmd, dict):
+            self.commands += 1
+            commands.append(cmd)
+        else:
+            self.malformed += 1
+
+    def _decode_unterminated(self, commands):
+        try:
+            text = self.buffer.decode()
+        except UnicodeDecodeError:
+            return
+        decoder = json.JSONDecoder()
+        parsed = []
+        index = 0
+        while index < len(text):
+            try:
+                cmd, index = decoder.raw_decode(text, index)
+            except ValueError:
+                return  # Still incomplete, wait for more bytes
+            parsed.append(cmd)
+            while index < len(text) and text[index].isspace():
+                index += 1
+        for cmd in parsed:
+            if isinstance(cmd, dict):
+                self.commands += 1
+                commands.append(cmd)
+            else:
+                self.malformed += 1
+        self.buffer.clear()
+        self.scan_from = 0
+
+
+def diff_state(old, new):
+    """Return (changes, removed): nested dict of changed values and paths of removed keys"""
+    changes = {}
+    removed = []
+    _diff(old, new, (), changes, removed)
+    return changes, removed
+
+
+def _diff(old, new, path, changes, removed):
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+            continue
+        previous = old[key]
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = {}
+            _diff(previous, value, path + (key,), nested, removed)
+            if nested:
+                changes[key] = nested
+        elif previous != value:
+            changes[key] = value
+    for key in old:
+        if key not in new:
+            removed.append(list(path + (key,)))
+
+
+def encode_frame(frame):
+    return (json.dumps(frame, separators=(",", ":")) + "\n").encode()
+
+
+def encode_ack(cmd, wire_format=FORMAT_JSON, status="ok", seq=None):
+    """Acknowledge a command that carried an "id"; binary clients get it as a FRAME_ACK frame
+
+    seq is the last state published before the command was applied: any state frame with a
+    higher seq already reflects it.
+    """
+    ack = {"type": "ACK", "id": cmd.get("id"), "event": cmd.get("event"), "status": status}
+    if seq is not None:
+        ack["seq"] = seq
+    if wire_format == FORMAT_BINARY:
+        body = json.dumps(ack, separators=(",", ":")).encode()
+        return FRAME_HEADER.pack(FRAME_HEADER.size - 2 + len(body), FRAME_ACK, 0) + body
+    return encode_frame(ack)
+
+
+def encode_keyframe(snapshot):
+    """Full state tagged with its sequence number"""
+    return encode_frame({"type": "KEYFRAME", "seq": snapshot.seq, "state": snapshot.state})
+
+
+def encode_delta(previous, snapshot):
+    """Only the keys that changed since the previous tick's snapshot"""
+    changes, removed = diff_state(previous.state, snapshot.state)
+    frame = {"type": "DELTA", "seq": snapshot.seq, "changes": changes}
+    if removed:
+        frame["removed"] = removed
+    return encode_frame(frame)
+
+
+class BinaryStateCodec:
+    """Packs a state snapshot into a fixed struct layout described by handshake()"""
+
+    def __init__(self, task_names):
+        fields = [
+            (("lights", "NS"), "B", "light"),
+            (("lights", "EW"), "B", "light"),
+            (("emergency",), "?", None),
+            (("weather",), "B", "weather"),
+            (("time_of_day",), "B", "time_of_day"),
+        ]
+        for name in task_names:
+            fields.append((("tasks", name, "state"), "B", "task_state"))
+            fields.append((("tasks", name, "priority"), "B", None))
+        fields += [
+            (("sensors", "vehicle_count_ns"), "H", None),
+            (("sensors", "vehicle_count_ew"), "H", None),
+            (("sensors", "pedestrian_button_ns"), "?", None),
+            (("sensors", "pedestrian_button_ew"), "?", None),
+            (("sensors", "ambient_light"), "H", None),
+            (("metrics", "emergency_response_time"), "f", None),
+            (("metrics", "cpu_utilization"), "f", None),
+            (("metrics", "deadline_misses"), "I", None),
+            (("metrics", "vehicle_throughput"), "I", None),
+            (("metrics", "avg_wait_time"), "f", None),
+            (("system_health", "uptime"), "f", None),
+            (("system_health", "connection_stable"), "?", None),
+            (("timestamp",), "d", None),
+        ]
+        self.fields = fields
+        self.limits = [FIELD_LIMITS.get(code) if enum is None else None for _, code, enum in fields]
+        self.body = struct.Struct("<" + "".join(code for _, code, _ in fields))
+        self.enum_index = {name: {value: i for i, value in enumerate(values)}
+                           for name, values in ENUMS.items()}
+
+    def handshake(self):
+        """JSON line sent once before the first binary frame"""
+        return encode_frame({
+            "type": "HANDSHAKE",
+            "format": FORMAT_BINARY,
+            "version": 1,
+            "enums": ENUMS,
+            "header": FRAME_HEADER.format,
+            "fields": [[list(path), code, enum] for path, code, enum in self.fields],
+        })
+
+    def encode(self, snapshot):
+        values = []
+        for (path, code, enum), limits in zip(self.fields, self.limits):
+            value = snapshot.state
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if enum is not None:
+                value = self.enum_index[enum].get(value, UNKNOWN_ENUM)
+            elif value is None:
+                value = 0
+            elif limits is not None:
+                low, high = limits
+                value = low if value < low else high if value > high else value
+                if code != "f":
+                    value = int(value)
+            values.append(value)
+        body = self.body.pack(*values)
+        return FRAME_HEADER.pack(FRAME_HEADER.size - 2 + len(body), FRAME_STATE, snapshot.seq) + body
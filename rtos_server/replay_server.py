@@ -0,0 +1,308 @@
+"""
+REPLAY SERVER - Re-serves a traffic_log.csv or recorded state stream over the port-5000 protocol
+"""
+import bisect
+import csv
+import json
+import math
+import socket
+import time
+from datetime import datetime
+
+from snapshot import StateSnapshot, SnapshotCell
+from ticker import PeriodicTicker
+
+SPEEDS = {"1x": 1.0, "10x": 10.0, "100x": 100.0, "max": None}
+
+# traffic_log.csv only has task states, priorities come from the live controller
+TASK_PRIORITIES = {"EmergencyHandler": 5, "Pedestrian": 3, "NormalControl": 2,
+                   "TrafficMonitor": 1, "WeatherSensor": 1, "CorridorControl": 1}
+
+
+def parse_log_time(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S.%f").timestamp()
+
+
+def load_csv_log(path, emergency_deadline=500):
+    """Rebuild a full state for every traffic_log.csv row. Returns [(timestamp, state)]"""
+    records = []
+    response_time = 0.0
+    misses = 0
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                timestamp = parse_log_time(row["timestamp"])
+                tasks = json.loads(row["task_states"])
+                vehicles = int(row["vehicle_count"])
+                wait = float(row["avg_wait_time"])
+                response = float(row["response_time_ms"])
+            except (KeyError, ValueError):
+                continue
+            if row["event_type"] == "EMERGENCY_ACTIVATED":
+                response_time = response
+                if response > emergency_deadline:
+                    misses += 1
+            start = records[0][0] if records else timestamp
+            records.append((timestamp, {
+                "lights": {"NS": row["lights_NS"], "EW": row["lights_EW"]},
+                "emergency": row["emergency"] == "True",
+                "weather": row["weather"],
+                "time_of_day": "DAY" if 6 <= datetime.fromtimestamp(timestamp).hour < 18 else "NIGHT",
+                "tasks": {name: {"state": state, "priority": TASK_PRIORITIES.get(name, 1)}
+                          for name, state in tasks.items()},
+                # The log keeps only the total, split it across both approaches
+                "sensors": {
+                    "vehicle_count_ns": vehicles - vehicles // 2,
+                    "vehicle_count_ew": vehicles // 2,
+                    "pedestrian_button_ns": row["event_type"] == "PEDESTRIAN_REQUEST",
+                    "pedestrian_button_ew": False,
+                    "ambient_light": 85
+                },
+                "metrics": {
+                    "emergency_response_time": response_time,
+                    "cpu_utilization": 0.0,
+                    "deadline_misses": misses,
+                    "vehicle_throughput": 0,
+                    "avg_wait_time": wait
+                },
+                "system_health": {"uptime": round(timestamp - start, 1), "connection_stable": True},
+                "timestamp": timestamp,
+                "event_type": row["event_type"]
+            }))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def load_stream(path):
+    """Read a recorded JSON-lines state stream (full states or keyframes). Returns [(timestamp, state)]"""
+    records = []
+    skipped = 0
+    with open(path) as f:
+        for line in f:
+            try:
+                frame = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            kind = frame.get("type")
+            if kind == "KEYFRAME":
+                frame = frame["state"]
+            elif kind is not None:
+                skipped += 1  # Deltas and handshakes cannot be replayed on their own
+                continue
+            if "timestamp" in frame:
+                records.append((frame["timestamp"], frame))
+    if skipped:
+        print(f"⚠️  Skipped {skipped} frames that are not full states")
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def load_records(path):
+    return load_csv_log(path) if path.endswith(".csv") else load_stream(path)
+
+
+def record_stream(path, host="localhost", port=5000, duration=None):
+    """Save a live server's full-state stream to a JSON-lines file for later replay"""
+    sock = socket.create_connection((host, port))
+    lines = 0
+    started = time.monotonic()
+    try:
+        with open(path, "wb") as f:
+            while duration is None or time.monotonic() - started < duration:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                f.write(data)
+                lines += data.count(b"\n")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+    print(f"💾 Recorded {lines} frames to {path}")
+
+
+def parse_seek(value, start):
+    """'+90' seconds into the recording, an epoch timestamp, or '2026-01-18 11:53:00'
+
+    Raises ValueError for anything else.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        timestamp = float(value)
+    elif isinstance(value, str):
+        value = value.strip()
+        try:
+            timestamp = start + float(value[1:]) if value.startswith("+") else float(value)
+        except ValueError:
+            try:
+                timestamp = datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                raise ValueError(f"Bad seek timestamp: {value!r}") from None
+    else:
+        raise ValueError(f"Bad seek timestamp: {value!r}")
+    if not math.isfinite(timestamp):
+        raise ValueError(f"Bad seek timestamp: {value!r}")
+    return timestamp
+
+
+def parse_speed(value):
+    """A SPEEDS name or a positive multiplier; None means as fast as possible. Raises ValueError"""
+    if isinstance(value, str) and value in SPEEDS:
+        return SPEEDS[value]
+    try:
+        speed = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Bad playback speed: {value!r}") from None
+    if not math.isfinite(speed) or speed <= 0:
+        raise ValueError(f"Bad playback speed: {value!r}")
+    return speed
+
+
+class ReplayController:
+    """Stands in for RobustRTOS behind EventLoopServer: serves recorded states, runs no control logic"""
+
+    def __init__(self, records, speed=1.0, base_rate=10.0, loop=False):
+        if not records:
+            raise ValueError("Nothing to replay")
+        self.records = records
+        self.times = [timestamp for timestamp, _ in records]
+        self.base_rate = base_rate
+        self.step = 1.0 / base_rate  # Recorded seconds covered by one tick
+        self.loop = loop
+        self.position = self.times[0]
+        self.index = 0
+        self.paused = False
+        self.finished = False
+        self.snapshot_seq = 0
+        self.snapshots = SnapshotCell()
+        self.ignored_commands = 0
+        self.ticker = PeriodicTicker(base_rate)
+        self.set_speed(speed)
+
+        # Task layout for the binary codec, taken from the first state that has one
+        self.tasks = next((state["tasks"] for _, state in records if state.get("tasks")), {})
+
+    @property
+    def start(self):
+        return self.times[0]
+
+    @property
+    def end(self):
+        return self.times[-1]
+
+    def set_speed(self, speed):
+        """Playback speed multiplier; None plays as fast as the event loop can send"""
+        self.speed = speed
+        self.update_rate()
+
+    def update_rate(self):
+        """Tick at the playback speed; while nothing moves, idle at the base rate instead of spinning"""
+        if self.paused or self.finished:
+            self.ticker.set_rate(self.base_rate)
+        else:
+            self.ticker.set_rate(self.base_rate * self.speed if self.speed else None)
+
+    def seek(self, timestamp):
+        self.position = min(max(timestamp, self.start), self.end)
+        self.index = max(0, bisect.bisect_right(self.times, self.position) - 1)
+        if self.finished:
+            self.finished = False
+            self.update_rate()
+
+    def broadcast_tick(self):
+        """Move the playhead one tick forward and publish the state recorded there"""
+        if not self.paused and not self.finished:
+            self.position += self.step
+            if self.position > self.end:
+                if self.loop:
+                    self.seek(self.start)
+                else:
+                    self.position = self.end
+                    self.finished = True
+                    self.update_rate()
+                    print("🏁 Replay reached the end of the recording")
+            times = self.times
+            while self.index + 1 < len(times) and times[self.index + 1] <= self.position:
+                self.index += 1
+        return self.publish_snapshot()
+
+    def publish_snapshot(self):
+        self.snapshot_seq += 1
+        state = dict(self.records[self.index][1])
+        state["replay"] = {
+            "position": round(self.position, 3),
+            "progress": round((self.position - self.start) / max(self.end - self.start, 1e-9) * 100, 1),
+            "speed": self.speed if self.speed else "max",
+            "paused": self.paused,
+        }
+        return self.snapshots.publish(StateSnapshot(self.snapshot_seq, state))
+
+    def latest_snapshot(self):
+        return self.snapshots.get()
+
+    def handle_command(self, cmd, received_at=None):
+        """Playback controls; controller commands are ignored since nothing is being controlled
+
+        Invalid arguments raise ValueError, which the server answers with an error ack.
+        """
+        event = str(cmd.get('event', '')).upper()
+        data = cmd.get('data')
+        if not isinstance(data, dict):
+            data = {}
+        if event == 'SEEK':
+            self.seek(parse_seek(data.get('timestamp', self.start), self.start))
+            print(f"⏩ Seek to {datetime.fromtimestamp(self.position).strftime('%Y-%m-%d %H:%M:%S')}")
+        elif event == 'SET_SPEED':
+            speed = data.get('speed', 1.0)
+            self.set_speed(parse_speed(speed))
+            print(f"🎞️  Playback speed: {speed}")
+        elif event == 'PAUSE':
+            self.paused = not self.paused
+            self.update_rate()
+            print("⏸️  Paused" if self.paused else "▶️  Resumed")
+        else:
+            self.ignored_commands += 1
+
+    def emergency_pending(self):
+        return False
+
+    def record_emergency_broadcast(self):
+        return None
+
+    def log_event(self, event_type, response_time=0.0):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+    from event_server import EventLoopServer
+
+    parser = argparse.ArgumentParser(description="Replay a traffic_log.csv or recorded stream to port-5000 clients")
+    parser.add_argument("source", help="traffic_log.csv, or a .jsonl stream saved with --record")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--speed", choices=sorted(SPEEDS), default="1x")
+    parser.add_argument("--seek", help="start at '+SECONDS', an epoch time or 'YYYY-MM-DD HH:MM:SS'")
+    parser.add_argument("--loop", action="store_true", help="start over at the end of the recording")
+    parser.add_argument("--record", action="store_true",
+                        help="instead of replaying, record a live server's stream into SOURCE")
+    parser.add_argument("--host", default="localhost", help="server to record from")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to record")
+    args = parser.parse_args()
+
+    if args.record:
+        record_stream(args.source, args.host, args.port, args.duration)
+    else:
+        replay = ReplayController(load_records(args.source), SPEEDS[args.speed], loop=args.loop)
+        if args.seek:
+            replay.seek(parse_seek(args.seek, replay.start))
+        print("="*70)
+        print("RTOS REPLAY SERVER")
+        print(f"Source: {args.source} ({len(replay.records)} records, "
+              f"{replay.end - replay.start:.0f}s recorded) at {args.speed}")
+        print("="*70)
+        server = EventLoopServer(replay, port=args.port)
+        server.start()
+        print(f"📡 Replaying on port {server.port}")
+        print("💡 Commands: SEEK {timestamp}, SET_SPEED {speed}, PAUSE")
+        print("-" * 70)
+        server.serve_forever()
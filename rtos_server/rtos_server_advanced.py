@@ -1,32 +1,74 @@
 """
 ROBUST ADVANCED RTOS SERVER - Built on working foundation
 """
+import select
 import socket
-import json
 import time
-import threading
-import random
+from collections import deque
 from datetime import datetime
+from snapshot import StateSnapshot, SnapshotCell
+from protocol import encode_ack
+from event_server import ClientConnection, ConnectionStats
+from scheduler import Scheduler, Job
+from timers import TimerWheel
+from ticker import PeriodicTicker
+from clock import SystemClock, VirtualClock
+from traffic_des import QueueSimulator
+from instrumentation import Histogram
 
 class RobustRTOS:
-    def __init__(self):
+    def __init__(self, policy="fp", tick_rate=10.0, overrun="skip", clock=None,
+                 splits=(15.0, 3.0, 12.0), emergency_deadline=500, seed=None):
+        # All controller timing goes through self.clock (SystemClock or VirtualClock)
+        self.clock = clock if clock is not None else SystemClock()
         self.lights = {"NS": "GREEN", "EW": "RED"}
         self.emergency = False
+        self.pedestrian_active = False
         self.weather = "CLEAR"
-        self.start_time = time.time()
-        
-        # RTOS Tasks
-        self.tasks = {
-            "NormalControl": {"state": "RUNNING", "priority": 2},
-            "EmergencyHandler": {"state": "BLOCKED", "priority": 5},
-            "Pedestrian": {"state": "READY", "priority": 3},
-            "TrafficMonitor": {"state": "RUNNING", "priority": 1}
-        }
+        self.start_time = self.clock.monotonic()
+        
+        # RTOS Tasks - run by the scheduler, self.tasks is the published view
+        self.scheduler = Scheduler(policy, clock=self.clock.monotonic)
+        self.ticker = PeriodicTicker(tick_rate, overrun, clock=self.scheduler.clock)
+        # Jobs run at most once per tick, so a period shorter than the tick could only miss.
+        # Periods and deadlines differ so FP, RM and EDF order the active jobs differently:
+        # the light cycle only needs every other tick, the detectors are sampled every tick
+        self.job_period = max(0.1, self.ticker.interval)
+        period = self.job_period
+        self.scheduler.add_job(Job("NormalControl", 2, 2 * period, self.normal_control_job))
+        self.scheduler.add_job(Job("EmergencyHandler", 5, period, self.emergency_handler_job,
+                                   deadline=period / 2, blocked=True))
+        self.scheduler.add_job(Job("Pedestrian", 3, period, self.pedestrian_job, blocked=True, idle_state="READY"))
+        self.scheduler.add_job(Job("TrafficMonitor", 1, period, self.traffic_monitor_job))
+        self.tasks = self.scheduler.task_table()
+        self.timers = TimerWheel(clock=self.scheduler.clock)
+        self.timing_stats = {}
+        self.corridor = None
+        self.corridor_stats = {}
+        
+        # Light cycle phase follows the monotonic clock, aligned to the wall clock at startup
+        self.splits = tuple(splits)  # NS green, NS yellow, EW green (seconds)
+        self.cycle_length = sum(self.splits)
+        self.cycle_origin = self.clock.monotonic() - (self.clock.time() % self.cycle_length)
+        self.scheduler_stats = {}
+        self.last_stats_publish = 0.0
+        self.logger = None  # EventLogger, see attach_logger
+        self.metrics_log_interval = 5.0
+        self.last_metrics_log = 0.0
+        self.emergency_deadline_misses = 0
+        self.worst_emergency_response = 0.0
+        self.emergency_hist = Histogram()
+        self.exporter = None  # MetricsExporter, see attach_exporter
+        self.sensor_ingest = None  # SensorIngest, see attach_sensor_ingest
+        
+        # Vehicle queues behind the sensors, simulated event by event
+        self.traffic = QueueSimulator(weather=self.weather, start=self.clock.monotonic(), seed=seed)
+        self.departure_samples = deque(maxlen=61)  # (time, departed) once a second
         
         # Virtual Sensors
         self.sensors = {
-            "vehicle_count_ns": 12,
-            "vehicle_count_ew": 8,
+            "vehicle_count_ns": 0,
+            "vehicle_count_ew": 0,
             "pedestrian_button_ns": False,
             "pedestrian_button_ew": False,
             "ambient_light": 85
@@ -35,120 +77,322 @@ class RobustRTOS:
         # Performance Metrics
         self.metrics = {
             "emergency_response_time": 0.0,
-            "cpu_utilization": 45.2,
+            "cpu_utilization": 0.0,
             "deadline_misses": 0,
-            "vehicle_throughput": 20
+            "vehicle_throughput": 0,   # Vehicles per minute over the last minute
+            "avg_wait_time": 0.0       # Seconds, recent departures
         }
         
         # Configuration
-        self.emergency_deadline = 500  # 500ms
+        self.emergency_deadline = emergency_deadline  # ms
+        self.snapshot_seq = 0
+        self.snapshots = SnapshotCell()  # Latest published version, readable from any thread
+        self.emergency_received_at = None  # latency_clock() of an emergency not yet broadcast
+        self.max_client_lag = 50  # Frames the legacy single-client loop lets a client fall behind
+        
+        self.snapshots.publish(StateSnapshot(0, self.snapshot_state()))
         
         print("="*70)
         print("ROBUST RTOS TRAFFIC CONTROL SYSTEM")
-        print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Started: {datetime.fromtimestamp(self.clock.time()).strftime('%Y-%m-%d %H:%M:%S')}"
+              f"{' (virtual clock)' if self.clock.virtual else ''}")
         print("="*70)
     
-    def get_system_state(self):
-        """Get complete system state"""
-        # Auto-cycle lights when not in emergency
-        if not self.emergency:
-            cycle_time = int(time.time()) % 30
-            if cycle_time < 15:
-                self.lights = {"NS": "GREEN", "EW": "RED"}
-                self.tasks["NormalControl"]["state"] = "RUNNING"
-            elif cycle_time < 18:
-                self.lights = {"NS": "YELLOW", "EW": "RED"}
-            elif cycle_time < 30:
-                self.lights = {"NS": "RED", "EW": "GREEN"}
-        
-        # Update sensor data
-        if self.lights["NS"] == "GREEN":
-            self.sensors["vehicle_count_ns"] = max(0, self.sensors["vehicle_count_ns"] - random.randint(0, 2))
-            self.sensors["vehicle_count_ew"] = min(20, self.sensors["vehicle_count_ew"] + random.randint(0, 1))
+    def normal_control_job(self, now):
+        """NormalControl: fixed-time light cycle (30s with the default splits)"""
+        ns_green, yellow, _ = self.splits
+        cycle_time = (now - self.cycle_origin) % self.cycle_length
+        if cycle_time < ns_green:
+            self.lights = {"NS": "GREEN", "EW": "RED"}
+        elif cycle_time < ns_green + yellow:
+            self.lights = {"NS": "YELLOW", "EW": "RED"}
         else:
-            self.sensors["vehicle_count_ew"] = max(0, self.sensors["vehicle_count_ew"] - random.randint(0, 2))
-            self.sensors["vehicle_count_ns"] = min(20, self.sensors["vehicle_count_ns"] + random.randint(0, 1))
+            self.lights = {"NS": "RED", "EW": "GREEN"}
+    
+    def emergency_handler_job(self, now):
+        """EmergencyHandler: hold the emergency corridor green"""
+        self.lights = {"NS": "GREEN", "EW": "RED"}
+    
+    def pedestrian_job(self, now):
+        """Pedestrian: hold all directions red while people cross"""
+        self.lights = {"NS": "RED", "EW": "RED"}
+    
+    def traffic_monitor_job(self, now):
+        """TrafficMonitor: run the vehicle queues up to now and read the detectors"""
+        self.traffic.set_lights(self.lights, now)
+        self.sensors["vehicle_count_ns"] = self.traffic.queue_length("NS")
+        self.sensors["vehicle_count_ew"] = self.traffic.queue_length("EW")
+    
+    def attach_logger(self, logger):
+        """Write events to the CSV event log through a started EventLogger"""
+        self.logger = logger
+        self.log_event("SYSTEM_START")
+    
+    def log_event(self, event_type, response_time=0.0):
+        """Hand one row to the logger's queue; never blocks the control path"""
+        if self.logger is None:
+            return
+        self.logger.log(self.clock.time(), event_type, self.lights["NS"], self.lights["EW"],
+                        self.emergency,
+                        self.sensors["vehicle_count_ns"] + self.sensors["vehicle_count_ew"],
+                        self.metrics["avg_wait_time"], round(response_time, 3), self.weather,
+                        {name: info["state"] for name, info in self.tasks.items()})
+    
+    def attach_corridor(self, engine):
+        """Step a CorridorEngine alongside this junction as its own periodic job"""
+        self.corridor = engine
+        self.corridor_last_step = self.scheduler.clock()
+        self.scheduler.add_job(Job("CorridorControl", 1, self.job_period, self.corridor_job,
+                                   deadline=3 * self.job_period))
+        self.tasks = self.scheduler.task_table()
+    
+    def corridor_job(self, now):
+        """CorridorControl: advance every corridor intersection in one vectorized step"""
+        self.corridor.step(now - self.corridor_last_step)
+        self.corridor_last_step = now
+    
+    def release_time(self):
+        """Jobs are released on the tick grid: this tick while one is running, otherwise the next"""
+        ticker = self.ticker
+        if ticker.tick_started_at is not None:
+            return ticker.current_deadline
+        return ticker.next_deadline
+    
+    def update_task_blocking(self, now=None):
+        """Only one job owns the lights: emergency beats pedestrian beats the normal cycle"""
+        if now is None:
+            now = self.release_time()
+        scheduler = self.scheduler
+        if self.emergency:
+            scheduler.unblock("EmergencyHandler", now)
+            scheduler.block("Pedestrian")
+            scheduler.block("NormalControl")
+        elif self.pedestrian_active:
+            scheduler.block("EmergencyHandler")
+            scheduler.unblock("Pedestrian", now)
+            scheduler.block("NormalControl")
+        else:
+            scheduler.block("EmergencyHandler")
+            scheduler.block("Pedestrian")
+            scheduler.unblock("NormalControl", now)
+    
+    def update_state(self):
+        """Advance lights and sensors by one controller tick"""
+        now = self.scheduler.clock()
+        self.timers.advance(now)
+        self.scheduler.run(now)
+        if self.sensor_ingest is not None:
+            # Field readings override the simulated detectors wherever a source is reporting
+            self.sensor_ingest.fold(self.sensors)
+        self.tasks = self.scheduler.task_table()
+        self.metrics["deadline_misses"] = self.scheduler.deadline_misses + self.emergency_deadline_misses
         
-        return {
-            "lights": self.lights,
+        # Per-job timing changes every tick, publish it once a second
+        if now - self.last_stats_publish >= 1.0:
+            self.last_stats_publish = now
+            self.metrics["cpu_utilization"] = self.scheduler.cpu_utilization(now)
+            self.scheduler_stats = {
+                "policy": self.scheduler.policy.name,
+                "preemptions": self.scheduler.preemptions,
+                "jobs": self.scheduler.job_stats()
+            }
+            self.timing_stats = self.ticker.stats()
+            self.update_traffic_metrics(now)
+        if now - self.last_metrics_log >= self.metrics_log_interval:
+            self.last_metrics_log = now
+            self.log_event("METRICS_UPDATE")
+            if self.corridor is not None:
+                self.corridor_stats = self.corridor.summary()
+    
+    def update_traffic_metrics(self, now):
+        """Throughput and wait time from the vehicles that actually cleared the junction"""
+        samples = self.departure_samples
+        samples.append((now, self.traffic.total_departed))
+        oldest_time, oldest_departed = samples[0]
+        if now > oldest_time:
+            self.metrics["vehicle_throughput"] = round(
+                (samples[-1][1] - oldest_departed) / (now - oldest_time) * 60)
+        self.metrics["avg_wait_time"] = round(self.traffic.average_wait(), 2)
+    
+    def snapshot_state(self):
+        """Copy of the current state that later updates cannot change"""
+        now = self.clock.time()
+        state = {
+            "lights": dict(self.lights),
             "emergency": self.emergency,
             "weather": self.weather,
-            "time_of_day": "DAY" if 6 <= datetime.now().hour < 18 else "NIGHT",
-            "tasks": self.tasks,
-            "sensors": self.sensors,
-            "metrics": self.metrics,
+            "time_of_day": "DAY" if 6 <= datetime.fromtimestamp(now).hour < 18 else "NIGHT",
+            "tasks": {name: dict(info) for name, info in self.tasks.items()},
+            "sensors": dict(self.sensors),
+            "metrics": dict(self.metrics),
+            # Stats dicts are replaced wholesale each second, never mutated, so they can be shared
+            "scheduler": self.scheduler_stats,
+            "timing": self.timing_stats,
             "system_health": {
-                "uptime": round(time.time() - self.start_time, 1),
+                "uptime": round(self.clock.monotonic() - self.start_time, 1),
                 "connection_stable": True
             },
-            "timestamp": time.time()
+            "timestamp": now
         }
+        if self.corridor is not None:
+            state["corridor"] = self.corridor_stats
+        return state
     
-    def handle_emergency(self):
-        """Handle emergency vehicle"""
-        emergency_start = time.time()
+    def get_system_state(self):
+        """Get complete system state"""
+        return self.broadcast_tick().state
+    
+    def broadcast_tick(self):
+        """Advance state once and encode it once for every subscriber"""
+        self.update_state()
+        return self.publish_snapshot()
+    
+    def publish_snapshot(self):
+        """Encode the current state without advancing it (out-of-tick pushes)"""
+        self.snapshot_seq += 1
+        return self.snapshots.publish(StateSnapshot(self.snapshot_seq, self.snapshot_state()))
+    
+    def latest_snapshot(self):
+        """Most recently published version; safe to call from any thread, takes no lock"""
+        return self.snapshots.get()
+    
+    def run_simulation(self, duration, commands=(), on_tick=None):
+        """Run headless on a VirtualClock: no sockets, no sleeping, ticks as fast as the CPU allows
         
-        # Record task states before emergency
-        old_states = {k: v["state"] for k, v in self.tasks.items()}
+        commands is a list of (seconds_from_start, command_dict); on_tick(snapshot) sees every frame.
+        A command is applied on the first tick at or after its time and counts as received at that
+        time, so emergency response is the simulated wait for the tick that broadcasts it.
+        """
+        if not self.clock.virtual:
+            raise ValueError("run_simulation needs a VirtualClock")
+        start = self.clock.monotonic()
+        end = start + duration
+        pending = sorted(commands, key=lambda item: item[0])
+        index = 0
+        ticker = self.ticker
+        while ticker.next_deadline <= end:
+            self.clock.advance_to(ticker.next_deadline)
+            now = self.clock.monotonic()
+            while index < len(pending) and start + pending[index][0] <= now:
+                self.handle_command(pending[index][1], start + pending[index][0])
+                index += 1
+            ticker.begin(now)
+            if on_tick is not None:
+                on_tick(self.broadcast_tick())
+            else:
+                self.update_state()  # Nobody is listening, skip encoding
+            self.record_emergency_broadcast()
+            ticker.end(now)
+        self.clock.advance_to(end)
+        return self.snapshot_state()
+    
+    def latency_clock(self):
+        """Timebase for emergency response: simulated time when virtual, perf_counter() otherwise"""
+        return self.clock.monotonic() if self.clock.virtual else time.perf_counter()
+    
+    def handle_emergency(self, received_at=None):
+        """Handle emergency vehicle"""
+        # Response time runs from command receipt until the new state is on the wire
+        if self.emergency_received_at is None:
+            self.emergency_received_at = received_at if received_at is not None else self.latency_clock()
         
-        # Change states
+        # Change states - the corridor goes green now, EmergencyHandler holds it from the next tick
         self.emergency = True
-        self.lights = {"NS": "GREEN", "EW": "RED"}
-        self.tasks["NormalControl"]["state"] = "BLOCKED"
-        self.tasks["EmergencyHandler"]["state"] = "RUNNING"
+        self.update_task_blocking()
+        self.emergency_handler_job(self.scheduler.clock())
+        self.tasks = self.scheduler.task_table()
         
-        # Calculate response time
-        response_time = (time.time() - emergency_start) * 1000  # ms
+        # Auto-clear 10 seconds after the latest request
+        self.timers.schedule("emergency_clear", 10.0, self.clear_emergency)
+    
+    def clear_emergency(self):
+        """Timer callback: leave emergency mode"""
+        if self.emergency:  # Check if still in emergency
+            self.emergency = False
+            self.update_task_blocking()
+            print("✅ Emergency cleared, normal operation resumed")
+    
+    def emergency_pending(self):
+        """True while an emergency has been applied but not yet broadcast"""
+        return self.emergency_received_at is not None
+    
+    def record_emergency_broadcast(self):
+        """Measure receipt-to-broadcast latency once the emergency state has been sent"""
+        if self.emergency_received_at is None:
+            return None
+        response_time = (self.latency_clock() - self.emergency_received_at) * 1000  # ms
+        self.emergency_received_at = None
         self.metrics["emergency_response_time"] = response_time
+        self.worst_emergency_response = max(self.worst_emergency_response, response_time)
+        self.emergency_hist.observe(response_time)
         
         # Check deadline
         if response_time > self.emergency_deadline:
+            self.emergency_deadline_misses += 1
             self.metrics["deadline_misses"] += 1
         
         print(f"🚑 EMERGENCY! Response: {response_time:.1f}ms | "
               f"Deadline: {self.emergency_deadline}ms | "
               f"Misses: {self.metrics['deadline_misses']}")
-        
-        # Auto-clear after 10 seconds
-        def clear_emergency():
-            if self.emergency:  # Check if still in emergency
-                self.emergency = False
-                self.tasks["NormalControl"]["state"] = "RUNNING"
-                self.tasks["EmergencyHandler"]["state"] = "BLOCKED"
-                print("✅ Emergency cleared, normal operation resumed")
-        
-        threading.Timer(10.0, clear_emergency).start()
-        
+        # Logged only after the state is on the wire, so it cannot delay the response
+        self.log_event("EMERGENCY_ACTIVATED", response_time)
         return response_time
     
     def handle_pedestrian(self):
         """Handle pedestrian crossing request"""
         print("🚶 Pedestrian crossing activated")
-        self.lights = {"NS": "RED", "EW": "RED"}
-        self.tasks["Pedestrian"]["state"] = "RUNNING"
-        
-        # Auto-clear after 5 seconds
-        def clear_pedestrian():
-            self.tasks["Pedestrian"]["state"] = "READY"
-            self.lights = {"NS": "GREEN", "EW": "RED"}
-            print("✅ Pedestrian crossing complete")
+        self.pedestrian_active = True
+        self.update_task_blocking()
+        self.log_event("PEDESTRIAN_REQUEST")
         
-        threading.Timer(5.0, clear_pedestrian).start()
+        # Auto-clear 5 seconds after the latest request
+        self.timers.schedule("pedestrian_clear", 5.0, self.clear_pedestrian)
+    
+    def clear_pedestrian(self):
+        """Timer callback: end the crossing phase"""
+        self.pedestrian_active = False
+        self.update_task_blocking()
+        print("✅ Pedestrian crossing complete")
     
     def handle_weather_change(self, new_weather):
         """Change weather condition"""
         valid_weather = ["CLEAR", "RAIN", "FOG", "SNOW"]
         if new_weather in valid_weather:
             self.weather = new_weather
+            self.traffic.set_weather(new_weather)
             print(f"🌤️  Weather changed to: {new_weather}")
+            self.log_event("WEATHER_CHANGE")
     
-    def start_server(self, port=5000):
-        """Start the robust RTOS server"""
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server.bind(('0.0.0.0', port))
-        server.listen(1)
+    def handle_command(self, cmd, received_at=None):
+        """Dispatch a command received from a visualization"""
+        event = str(cmd.get('event', '')).upper()
+        data = cmd.get('data')
+        if not isinstance(data, dict):
+            data = {}
         
+        if event == 'EMERGENCY':
+            self.handle_emergency(received_at)
+        elif event == 'PEDESTRIAN':
+            self.handle_pedestrian()
+        elif event == 'CHANGE_WEATHER':
+            new_weather = data.get('weather', 'CLEAR')
+            self.handle_weather_change(new_weather)
+        elif event == 'RESET_METRICS':
+            self.reset_metrics()
+    
+    def reset_metrics(self):
+        """Clear deadline misses and scheduler measurements"""
+        self.scheduler.reset_stats()
+        self.ticker.reset_stats()
+        self.traffic.reset_stats()
+        self.departure_samples.clear()
+        self.emergency_deadline_misses = 0
+        self.worst_emergency_response = 0.0
+        self.emergency_hist.reset()
+        self.metrics['deadline_misses'] = 0
+        print("📊 Metrics reset")
+    
+    def print_command_help(self, port):
         print(f"📡 Server listening on port {port}")
         print("💡 Commands from visualization:")
         print("   E = Emergency vehicle")
@@ -156,47 +400,103 @@ class RobustRTOS:
         print("   W = Change weather")
         print("   R = Reset metrics")
         print("-" * 70)
+    
+    def attach_sensor_ingest(self, ingest):
+        """Fold UDP sensor readings from a started SensorIngest into the sensors every tick"""
+        self.sensor_ingest = ingest
+    
+    def attach_exporter(self, exporter):
+        """Publish metrics for a MetricsExporter from the control loop, after each tick"""
+        from metrics_server import collect_controller_metrics
+        
+        self.exporter = exporter
+        exporter.collect = lambda: collect_controller_metrics(self)
+    
+    def start_event_server(self, port=5000):
+        """Serve any number of visualizations from a single event loop"""
+        from event_server import EventLoopServer
+        from metrics_server import collect_controller_metrics
+        
+        server = EventLoopServer(self, port=port)
+        if self.exporter is not None:
+            self.exporter.collect = lambda: collect_controller_metrics(self, server)
+            server.exporter = self.exporter
+        server.start()
+        self.print_command_help(server.port)
+        server.serve_forever()
+    
+    def start_server(self, port=5000):
+        """Start the robust RTOS server"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('0.0.0.0', port))
+        server.listen(1)
+        
+        # Same traffic and command counters as the event loop, for the metrics endpoint
+        stats = ConnectionStats()
+        if self.exporter is not None:
+            from metrics_server import collect_controller_metrics
+            self.exporter.collect = lambda: collect_controller_metrics(self, stats)
+        
+        self.print_command_help(port)
         
         while True:
             try:
                 # Accept connection
                 client, addr = server.accept()
-                client.settimeout(0.1)  # Short timeout for recv
                 print(f"✅ Visualization connected: {addr}")
+                self.log_event("CLIENT_CONNECTED")
+                # Non-blocking with a latest-wins queue: a stalled client cannot stall the controller
+                client.setblocking(False)
+                conn = ClientConnection(client, addr)
+                decoder = conn.decoder
+                stats.clients[conn.fd] = conn
+                ticker = self.ticker
                 
                 # Main communication loop
                 while True:
                     try:
-                        # Check for incoming commands
-                        try:
-                            data = client.recv(1024)
-                            if data:
+                        # Wait for commands (or room to send) until the next state frame is due
+                        writers = [client] if conn.has_pending() else []
+                        readers = [client] if self.sensor_ingest is None else [client, self.sensor_ingest.sock]
+                        readable, _, _ = select.select(readers, writers, [], ticker.time_until_next())
+                        if self.sensor_ingest is not None and self.sensor_ingest.sock in readable:
+                            self.sensor_ingest.receive()
+                        if client in readable:
+                            commands = conn.read()
+                            received_at = time.perf_counter()
+                            if commands is None:
+                                raise ConnectionResetError
+                            for cmd in commands:
+                                status = "ok"
                                 try:
-                                    cmd = json.loads(data.decode())
-                                    event = cmd.get('event', '').upper()
-                                    
-                                    if event == 'EMERGENCY':
-                                        self.handle_emergency()
-                                    elif event == 'PEDESTRIAN':
-                                        self.handle_pedestrian()
-                                    elif event == 'CHANGE_WEATHER':
-                                        new_weather = cmd.get('data', {}).get('weather', 'CLEAR')
-                                        self.handle_weather_change(new_weather)
-                                    elif event == 'RESET_METRICS':
-                                        self.metrics['deadline_misses'] = 0
-                                        print("📊 Metrics reset")
-                                    
-                                except json.JSONDecodeError:
-                                    pass
-                        except socket.timeout:
-                            pass  # No data yet
+                                    self.handle_command(cmd, received_at)
+                                except Exception as e:
+                                    print(f"⚠️  Rejected command: {e!r} in {str(cmd)[:80]}")
+                                    decoder.malformed += 1
+                                    status = "error"
+                                stats.observe_latency(cmd, received_at)
+                                if "id" in cmd:
+                                    conn.queue(encode_ack(cmd, status=status, seq=self.snapshot_seq))
                         
-                        # Send current state
-                        state = self.get_system_state()
-                        client.send((json.dumps(state) + "\n").encode())
+                        # Emergencies go out at once, everything else on the controller tick
+                        if self.emergency_pending():
+                            conn.queue_state(self.publish_snapshot().payload)
+                            conn.flush()
+                            self.record_emergency_broadcast()
                         
-                        # Small delay
-                        time.sleep(0.1)
+                        if ticker.due():
+                            ticker.begin()
+                            conn.queue_state(self.broadcast_tick().payload)
+                            ticker.end()
+                            if self.exporter is not None:
+                                self.exporter.publish()
+                        conn.flush()
+                        
+                        if conn.lag_ticks > self.max_client_lag:
+                            print(f"🐢 Visualization fell {conn.lag_ticks} frames behind, disconnecting")
+                            stats.lagged_out += 1
+                            break
                         
                     except (ConnectionResetError, BrokenPipeError):
                         print(f"📭 Visualization disconnected")
@@ -206,7 +506,11 @@ class RobustRTOS:
                         break
                 
                 # Cleanup
-                client.close()
+                conn.close()
+                stats.clients.pop(conn.fd, None)
+                stats.retire(conn)
+                if decoder.malformed:
+                    print(f"⚠️  {decoder.malformed} malformed commands from {addr}")
                 print("🔄 Waiting for reconnection...")
                 
             except KeyboardInterrupt:
@@ -220,5 +524,81 @@ class RobustRTOS:
         print("👋 Server stopped")
 
 if __name__ == "__main__":
-    rtos = RobustRTOS()
-    rtos.start_server(port=5000)
\ No newline at end of file
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description="Robust RTOS traffic control server")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--event-loop", action="store_true",
+                        help="serve many visualizations concurrently from one event loop")
+    parser.add_argument("--tick-rate", type=float, default=10.0,
+                        help="controller ticks (state frames) per second")
+    parser.add_argument("--overrun", choices=["skip", "catchup"], default="skip",
+                        help="what to do with tick deadlines missed by a late tick")
+    parser.add_argument("--policy", choices=["fp", "rm", "edf"], default="fp",
+                        help="task scheduling policy: fixed-priority, rate-monotonic or EDF")
+    parser.add_argument("--virtual", action="store_true",
+                        help="run headless on a virtual clock as fast as possible (no server)")
+    parser.add_argument("--duration", type=float, default=86400.0,
+                        help="simulated seconds to run with --virtual")
+    parser.add_argument("--corridor", type=int, default=0, metavar="N",
+                        help="also simulate a green-wave corridor of N intersections (needs numpy)")
+    parser.add_argument("--log-file", default="logs/traffic_log.csv",
+                        help="event log read by analyze_data.py (logs/ is not tracked)")
+    parser.add_argument("--no-log", action="store_true", help="do not write the event log")
+    parser.add_argument("--sensor-port", type=int, default=0,
+                        help="accept UDP sensor readings on this port (see sensor_emitter.py)")
+    parser.add_argument("--metrics-port", type=int, default=9100,
+                        help="serve Prometheus metrics on 127.0.0.1:PORT/metrics (0 disables)")
+    args = parser.parse_args()
+    
+    rtos = RobustRTOS(policy=args.policy, tick_rate=args.tick_rate, overrun=args.overrun,
+                      clock=VirtualClock() if args.virtual else None)
+    if args.corridor:
+        from corridor_engine import CorridorEngine, green_wave_offsets
+        rtos.attach_corridor(CorridorEngine(args.corridor, offsets=green_wave_offsets(args.corridor)))
+    logger = None
+    if not args.no_log:
+        from event_logger import EventLogger
+        logger = EventLogger(args.log_file).start()
+        rtos.attach_logger(logger)
+    ingest = None
+    if args.sensor_port and not args.virtual:
+        from sensor_ingest import SensorIngest
+        ingest = SensorIngest(port=args.sensor_port).start()
+        rtos.attach_sensor_ingest(ingest)
+    exporter = None
+    if args.metrics_port and not args.virtual:
+        from metrics_server import MetricsExporter
+        exporter = MetricsExporter(None, port=args.metrics_port)
+        try:
+            exporter.start()
+            rtos.attach_exporter(exporter)
+        except OSError as e:
+            # Metrics are optional; a taken port must not keep the controller from running
+            print(f"⚠️  Metrics disabled, cannot listen on port {args.metrics_port}: {e}")
+            exporter = None
+    try:
+        if args.virtual:
+            started = time.perf_counter()
+            final = rtos.run_simulation(args.duration)
+            print(f"⏩ Simulated {args.duration:.0f}s in {time.perf_counter() - started:.1f}s")
+            print(json.dumps(final["metrics"], indent=2))
+            if args.corridor:
+                print(json.dumps(final["corridor"], indent=2))
+        elif args.event_loop:
+            rtos.start_event_server(port=args.port)
+        else:
+            rtos.start_server(port=args.port)
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        if ingest is not None:
+            ingest.close()
+            stats = ingest.stats()
+            print(f"📥 {stats['datagrams']} sensor datagrams, {stats['late']} late, "
+                  f"{stats['lost']} lost, {stats['malformed'] + stats['overflow']} dropped")
+        if logger is not None:
+            logger.stop()
+            stats = logger.stats()
+            print(f"📝 {stats['written']} events logged to {args.log_file}, {stats['dropped']} dropped")
\ No newline at end of file
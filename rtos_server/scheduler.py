@@ -0,0 +1,226 @@
+"""
+RTOS SCHEDULER CORE - Runs controller jobs under a pluggable scheduling policy
+"""
+import time
+from collections import deque
+
+
+class FixedPriorityPolicy:
+    """Highest declared priority first (FreeRTOS style, larger number wins)"""
+    name = "fixed-priority"
+
+    def key(self, job):
+        return (-job.priority, job.pending.release)
+
+
+class RateMonotonicPolicy:
+    """Shortest period first, declared priority breaks ties"""
+    name = "rate-monotonic"
+
+    def key(self, job):
+        return (job.period, -job.priority, job.pending.release)
+
+
+class EDFPolicy:
+    """Earliest absolute deadline first"""
+    name = "edf"
+
+    def key(self, job):
+        return (job.pending.deadline, -job.priority)
+
+
+POLICIES = {
+    "fp": FixedPriorityPolicy,
+    "rm": RateMonotonicPolicy,
+    "edf": EDFPolicy,
+}
+
+
+class JobInstance:
+    """One release of a job waiting to be dispatched"""
+    __slots__ = ("release", "deadline")
+
+    def __init__(self, release, deadline):
+        self.release = release
+        self.deadline = deadline
+
+
+class Job:
+    """A periodic controller task; blocked jobs are not released until unblocked"""
+
+    def __init__(self, name, priority, period, action, deadline=None, blocked=False,
+                 idle_state="BLOCKED", window=100):
+        self.name = name
+        self.priority = priority
+        self.period = period
+        self.deadline = deadline if deadline is not None else period  # Relative deadline
+        self.action = action
+        self.blocked = blocked
+        self.idle_state = idle_state  # Shown in the task table while blocked
+        self.next_release = None
+        self.pending = None
+        self.running = False
+
+        # Measurements
+        self.releases = 0
+        self.completions = 0
+        self.deadline_misses = 0
+        self.skipped = 0  # Releases that fell due while the scheduler was not run at all
+        self.busy_time = 0.0
+        self.response_times = deque(maxlen=window)   # Release to completion (s)
+        self.start_latencies = deque(maxlen=window)  # Release to start (s)
+
+    def state(self):
+        if self.running:
+            return "RUNNING"
+        if self.blocked:
+            return self.idle_state
+        if self.pending is not None:
+            return "READY"
+        return "RUNNING"  # Active and keeping up with its releases
+
+    def stats(self):
+        """Average/worst response, release jitter and misses in milliseconds"""
+        responses = self.response_times
+        latencies = self.start_latencies
+        return {
+            "response_ms": round(sum(responses) / len(responses) * 1000, 2) if responses else 0.0,
+            "worst_response_ms": round(max(responses) * 1000, 2) if responses else 0.0,
+            "jitter_ms": round((max(latencies) - min(latencies)) * 1000, 2) if latencies else 0.0,
+            "deadline_misses": self.deadline_misses,
+            "skipped": self.skipped,
+        }
+
+    def reset_stats(self):
+        self.releases = 0
+        self.completions = 0
+        self.deadline_misses = 0
+        self.skipped = 0
+        self.busy_time = 0.0
+        self.response_times.clear()
+        self.start_latencies.clear()
+
+
+class Scheduler:
+    """Releases periodic jobs and dispatches ready ones in policy order"""
+
+    def __init__(self, policy="fp", clock=time.monotonic):
+        self.policy = POLICIES[policy]() if isinstance(policy, str) else policy
+        self.clock = clock
+        self.jobs = {}
+        self.preemptions = 0
+        self.started_at = clock()
+        self.busy_time = 0.0
+
+    def add_job(self, job):
+        if not job.blocked:
+            job.next_release = self.clock()
+        self.jobs[job.name] = job
+        return job
+
+    def block(self, name):
+        """Stop releasing a job; an unfinished release is dropped"""
+        job = self.jobs[name]
+        job.blocked = True
+        job.pending = None
+        job.next_release = None
+
+    def unblock(self, name, now=None):
+        """Make a job eligible again, released immediately"""
+        job = self.jobs[name]
+        if job.blocked:
+            job.blocked = False
+            job.next_release = self.clock() if now is None else now
+
+    def run(self, now=None):
+        """Release due jobs and run every ready job. Returns the number of jobs run"""
+        if now is None:
+            now = self.clock()
+        self._release(now)
+
+        # Jobs picked later in this pass waited behind the ones before them. The clock may be
+        # virtual and not move while jobs run, so that wait is measured on perf_counter()
+        pass_started = time.perf_counter()
+        ran = 0
+        while True:
+            ready = [job for job in self.jobs.values() if job.pending is not None]
+            if not ready:
+                break
+            job = min(ready, key=self.policy.key)
+            # A later release overtaking earlier ones is a preemption point
+            if any(other.pending.release < job.pending.release for other in ready if other is not job):
+                self.preemptions += 1
+            self._dispatch(job, now, time.perf_counter() - pass_started)
+            ran += 1
+            # Actions may unblock other jobs, so re-release before picking again
+            self._release(now)
+        return ran
+
+    def _release(self, now):
+        for job in self.jobs.values():
+            if job.blocked or job.next_release is None or job.next_release > now:
+                continue
+            release = job.next_release
+            behind = int((now - release) / job.period + 1e-9)
+            if behind:
+                # Nothing ran for whole periods (no client, a stall): the stale releases are
+                # skipped, not missed, and the one released now is timed from now. The grid stays
+                job.skipped += behind
+                job.next_release += behind * job.period
+                release = now
+            if job.pending is not None:
+                # The previous release never ran before the next one was due
+                job.deadline_misses += 1
+            job.pending = JobInstance(release, release + job.deadline)
+            job.releases += 1
+            job.next_release += job.period
+
+    def _dispatch(self, job, now, waited=0.0):
+        """Run one release; waited is the time spent earlier in the same run() pass"""
+        instance = job.pending
+        job.pending = None
+        start_latency = max(0.0, now - instance.release) + waited
+
+        job.running = True
+        started = time.perf_counter()
+        try:
+            job.action(now)
+        finally:
+            job.running = False
+        elapsed = time.perf_counter() - started
+
+        response = start_latency + elapsed
+        job.completions += 1
+        job.busy_time += elapsed
+        self.busy_time += elapsed
+        job.start_latencies.append(start_latency)
+        job.response_times.append(response)
+        if instance.release + response > instance.deadline:
+            job.deadline_misses += 1
+
+    @property
+    def deadline_misses(self):
+        return sum(job.deadline_misses for job in self.jobs.values())
+
+    def cpu_utilization(self, now=None):
+        """Share of elapsed time spent executing jobs, in percent"""
+        if now is None:
+            now = self.clock()
+        elapsed = now - self.started_at
+        return round(self.busy_time / elapsed * 100, 3) if elapsed > 0 else 0.0
+
+    def task_table(self):
+        """Task states in the shape of RobustRTOS.tasks"""
+        return {job.name: {"state": job.state(), "priority": job.priority}
+                for job in self.jobs.values()}
+
+    def job_stats(self):
+        """Per-job response time, jitter and deadline misses"""
+        return {job.name: job.stats() for job in self.jobs.values()}
+
+    def reset_stats(self, now=None):
+        for job in self.jobs.values():
+            job.reset_stats()
+        self.preemptions = 0
+        self.busy_time = 0.0
+        self.started_at = self.clock() if now is None else now
@@ -0,0 +1,118 @@
+"""
+SENSOR EMITTER - Synthetic loop detectors, pedestrian buttons and light meters sending UDP readings
+"""
+import random
+import socket
+import time
+
+from sensor_ingest import (MAX_READINGS, VEHICLE_NS, VEHICLE_EW, PEDESTRIAN_NS, PEDESTRIAN_EW,
+                           AMBIENT_LIGHT, encode_readings)
+
+
+class SyntheticSensor:
+    """One field device: a random-walk lane queue, a rarely pressed button or a light meter"""
+
+    def __init__(self, source, kind, rng):
+        self.source = source
+        self.kind = kind
+        self.rng = rng
+        self.seq = 0
+        self.value = rng.randint(0, 5) if kind in (VEHICLE_NS, VEHICLE_EW) else 0
+
+    def read(self):
+        rng = self.rng
+        if self.kind in (VEHICLE_NS, VEHICLE_EW):
+            self.value = max(0, min(15, self.value + rng.choice((-1, 0, 0, 1))))
+        elif self.kind in (PEDESTRIAN_NS, PEDESTRIAN_EW):
+            self.value = 1 if rng.random() < 0.01 else 0
+        else:
+            self.value = max(0, min(100, 85 + rng.randint(-5, 5)))
+        self.seq += 1
+        return (self.source, self.kind, self.seq, self.value)
+
+
+def build_sensors(detectors, seed=None):
+    """detectors lane queues per approach, plus one button per crossing and one light meter"""
+    rng = random.Random(seed)
+    sensors = []
+    for i in range(detectors):
+        sensors.append(SyntheticSensor(i, VEHICLE_NS, rng))
+        sensors.append(SyntheticSensor(i, VEHICLE_EW, rng))
+    sensors.append(SyntheticSensor(0, PEDESTRIAN_NS, rng))
+    sensors.append(SyntheticSensor(0, PEDESTRIAN_EW, rng))
+    sensors.append(SyntheticSensor(0, AMBIENT_LIGHT, rng))
+    return sensors
+
+
+def emit(host="127.0.0.1", port=5005, rate=10000.0, per_datagram=8, detectors=4, duration=10.0,
+         loss=0.0, reorder=0.0, duplicate=0.0, seed=None):
+    """Send `rate` datagrams per second for `duration` seconds, optionally impaired. Returns counters"""
+    rng = random.Random(seed)
+    sensors = build_sensors(detectors, seed)
+    per_datagram = max(1, min(per_datagram, MAX_READINGS))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = (host, port)
+    sent = dropped = reordered = duplicated = 0
+    held = None  # A datagram delayed behind the next one
+    index = 0
+    burst = max(1, int(rate / 1000))  # Datagrams per pacing step, keeps time.sleep() granularity out
+    step = burst / rate
+    started = next_send = time.perf_counter()
+    try:
+        while time.perf_counter() - started < duration:
+            for _ in range(burst):
+                readings = []
+                for _ in range(per_datagram):
+                    readings.append(sensors[index].read())
+                    index = (index + 1) % len(sensors)
+                datagram = encode_readings(readings)
+                if loss and rng.random() < loss:
+                    dropped += 1
+                    continue
+                if reorder and held is None and rng.random() < reorder:
+                    held = datagram
+                    reordered += 1
+                    continue
+                sock.sendto(datagram, target)
+                sent += 1
+                if duplicate and rng.random() < duplicate:
+                    sock.sendto(datagram, target)
+                    duplicated += 1
+                if held is not None:
+                    sock.sendto(held, target)
+                    sent += 1
+                    held = None
+            next_send += step
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+    elapsed = time.perf_counter() - started
+    return {"sent": sent, "dropped": dropped, "reordered": reordered, "duplicated": duplicated,
+            "readings": sent * per_datagram, "rate": round(sent / elapsed), "seconds": round(elapsed, 2)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Send synthetic sensor readings to the controller")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--rate", type=float, default=10000.0, help="datagrams per second")
+    parser.add_argument("--per-datagram", type=int, default=8, help=f"readings per datagram (max {MAX_READINGS})")
+    parser.add_argument("--detectors", type=int, default=4, help="lane detectors per approach")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of datagrams to drop")
+    parser.add_argument("--reorder", type=float, default=0.0, help="fraction of datagrams to delay by one")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="fraction of datagrams to send twice")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"📤 Sending {args.rate:,.0f} datagrams/s to udp://{args.host}:{args.port} for {args.duration:.0f}s")
+    result = emit(args.host, args.port, args.rate, args.per_datagram, args.detectors, args.duration,
+                  args.loss, args.reorder, args.duplicate, args.seed)
+    print(f"✅ Sent {result['sent']:,} datagrams ({result['rate']:,}/s), {result['readings']:,} readings; "
+          f"dropped {result['dropped']}, reordered {result['reordered']}, duplicated {result['duplicated']}")
@@ -0,0 +1,275 @@
+"""
+SENSOR INGEST - Field detector readings over UDP, batched per tick and folded into RobustRTOS.sensors
+"""
+import socket
+import struct
+import time
+
+# Datagram: header, then `count` readings. Little-endian, no padding between records
+HEADER = struct.Struct("<2sBB")   # magic, version, count
+READING = struct.Struct("<HBxIH")  # source id, kind, seq (per source and kind), value
+MAGIC = b"TS"
+VERSION = 1
+MAX_READINGS = (1400 - HEADER.size) // READING.size  # Stay under a typical MTU
+
+# Reading kinds and the sensor each one feeds
+VEHICLE_NS = 1
+VEHICLE_EW = 2
+PEDESTRIAN_NS = 3
+PEDESTRIAN_EW = 4
+AMBIENT_LIGHT = 5
+SENSOR_KINDS = {
+    VEHICLE_NS: "vehicle_count_ns",
+    VEHICLE_EW: "vehicle_count_ew",
+    PEDESTRIAN_NS: "pedestrian_button_ns",
+    PEDESTRIAN_EW: "pedestrian_button_ew",
+    AMBIENT_LIGHT: "ambient_light",
+}
+
+SEQ_MOD = 1 << 32
+SEQ_HALF = 1 << 31
+MAX_COUNT = 0xFFFF  # Summed counts are capped to what a reading (and the state frame) can carry
+
+
+def encode_readings(readings):
+    """readings is [(source, kind, seq, value)], at most MAX_READINGS of them"""
+    parts = [HEADER.pack(MAGIC, VERSION, len(readings))]
+    parts += [READING.pack(source, kind, seq % SEQ_MOD, value) for source, kind, seq, value in readings]
+    return b"".join(parts)
+
+
+class SensorIngest:
+    """Non-blocking UDP receiver; the event loop calls receive(), the controller tick calls fold()
+
+    Readings are deduplicated on arrival: for each (source, kind) only a sequence number newer than
+    any seen before is accepted, and within one tick only the newest accepted value is kept. fold()
+    applies the batch and aggregates every source that reported within stale_after seconds:
+    vehicle counts are summed, a button is pressed if any source says so, ambient light is averaged.
+    Kinds with no fresh source keep whatever value the controller simulated.
+
+    A gap in the sequence counts its missing readings as lost until they show up; one that
+    arrives within max_gap of the newest seq is moved from lost to late.
+    """
+
+    def __init__(self, host="0.0.0.0", port=5005, stale_after=2.0, max_sources=4096,
+                 max_per_read=2048, restart_window=1000, max_gap=64, max_count=MAX_COUNT,
+                 rcvbuf=4 * 1024 * 1024, clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.stale_after = stale_after
+        self.max_sources = max_sources        # Distinct (source, kind) keys tracked
+        self.max_per_read = max_per_read      # Datagrams per receive() so commands are not starved
+        self.restart_window = restart_window  # A jump back further than this is a restarted source
+        self.max_gap = max_gap                # Gaps wider than this are written off as lost at once
+        self.max_count = max_count
+        self.rcvbuf = rcvbuf
+        self.clock = clock
+        self.sock = None
+        self.buffer = bytearray(2048)
+        self.view = memoryview(self.buffer)
+
+        self.highest = {}  # (source, kind) -> newest seq accepted
+        self.missing = {}  # (source, kind) -> seqs skipped over that may still arrive reordered
+        self.batch = {}    # (source, kind) -> value received this tick
+        self.latest = {}   # (source, kind) -> (value, monotonic time applied)
+
+        self.datagrams = 0
+        self.readings = 0
+        self.malformed = 0    # Bad magic/version/length: dropped
+        self.overflow = 0     # Readings from sources beyond max_sources: dropped
+        self.late = 0         # Older than or equal to a reading already accepted
+        self.lost = 0         # Sequence gaps: sent but never arrived
+        self.coalesced = 0    # Superseded by a newer reading in the same tick
+        self.restarts = 0
+        self.ticks = 0
+        self.applied = 0
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        except OSError:
+            pass  # Keep the system default
+        sock.bind((self.host, self.port))
+        sock.setblocking(False)
+        self.port = sock.getsockname()[1]
+        self.sock = sock
+        print(f"📡 Sensor readings on udp://{self.host}:{self.port}")
+        return self
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def receive(self):
+        """Drain waiting datagrams into this tick's batch. Returns how many were read"""
+        recv_into = self.sock.recv_into
+        buffer, view = self.buffer, self.view
+        highest, batch, missing = self.highest, self.batch, self.missing
+        header_size, reading_size = HEADER.size, READING.size
+        unpack_header, iter_readings = HEADER.unpack_from, READING.iter_unpack
+        max_sources, restart_window, max_gap = self.max_sources, self.restart_window, self.max_gap
+        malformed = late = lost = coalesced = overflow = restarts = readings = 0
+
+        count = 0
+        while count < self.max_per_read:
+            try:
+                size = recv_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                continue  # ICMP port unreachable from an earlier send on some platforms
+            count += 1
+            if size < header_size:
+                malformed += 1
+                continue
+            magic, version, n = unpack_header(buffer)
+            if magic != MAGIC or version != VERSION or size != header_size + n * reading_size:
+                malformed += 1
+                continue
+            readings += n
+            for source, kind, seq, value in iter_readings(view[header_size:size]):
+                key = (source, kind)
+                last = highest.get(key)
+                if last is None:
+                    if len(highest) >= max_sources or kind not in SENSOR_KINDS:
+                        overflow += 1
+                        continue
+                else:
+                    ahead = (seq - last) % SEQ_MOD
+                    if ahead == 0:
+                        late += 1
+                        continue
+                    if ahead >= SEQ_HALF:
+                        if SEQ_MOD - ahead <= restart_window:
+                            late += 1  # Reordered or replayed
+                            gaps = missing.get(key)
+                            if gaps and seq in gaps:
+                                gaps.discard(seq)
+                                lost -= 1  # It was counted lost when its gap was seen
+                            continue
+                        restarts += 1
+                        missing.pop(key, None)
+                    elif ahead > 1:
+                        lost += ahead - 1
+                        if ahead <= max_gap:
+                            gaps = missing.setdefault(key, set())
+                            if len(gaps) >= max_gap:
+                                gaps.clear()  # Long gone; they stay lost
+                            gaps.update((last + i) % SEQ_MOD for i in range(1, ahead))
+                    if key in batch:
+                        coalesced += 1
+                highest[key] = seq
+                batch[key] = value
+
+        self.datagrams += count
+        self.readings += readings
+        self.malformed += malformed
+        self.late += late
+        self.lost += lost
+        self.coalesced += coalesced
+        self.overflow += overflow
+        self.restarts += restarts
+        return count
+
+    def fold(self, sensors, now=None):
+        """Apply this tick's batch and write the aggregated readings into sensors"""
+        if now is None:
+            now = self.clock()
+        self.ticks += 1
+        latest = self.latest
+        if self.batch:
+            self.applied += len(self.batch)
+            for key, value in self.batch.items():
+                latest[key] = (value, now)
+            self.batch = {}
+        if not latest:
+            return
+
+        oldest = now - self.stale_after
+        totals = {}
+        counts = {}
+        expired = []
+        for key, (value, applied_at) in latest.items():
+            if applied_at < oldest:
+                expired.append(key)
+                continue
+            kind = key[1]
+            totals[kind] = totals.get(kind, 0) + value
+            counts[kind] = counts.get(kind, 0) + 1
+        for key in expired:
+            del latest[key]
+
+        for kind, total in totals.items():
+            name = SENSOR_KINDS[kind]
+            if kind in (PEDESTRIAN_NS, PEDESTRIAN_EW):
+                sensors[name] = total > 0
+            elif kind == AMBIENT_LIGHT:
+                sensors[name] = round(total / counts[kind])
+            else:
+                sensors[name] = min(total, self.max_count)
+
+    def stats(self):
+        return {
+            "datagrams": self.datagrams,
+            "readings": self.readings,
+            "applied": self.applied,
+            "sources": len(self.latest),
+            "malformed": self.malformed,
+            "overflow": self.overflow,
+            "late": self.late,
+            "lost": self.lost,
+            "coalesced": self.coalesced,
+            "restarts": self.restarts,
+        }
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+if __name__ == "__main__":
+    import argparse
+    import selectors
+
+    parser = argparse.ArgumentParser(description="Receive sensor datagrams and print ingest rates")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="folds per second")
+    parser.add_argument("--duration", type=float, default=None)
+    args = parser.parse_args()
+
+    ingest = SensorIngest(port=args.port).start()
+    sensors = {name: 0 for name in SENSOR_KINDS.values()}
+    selector = selectors.DefaultSelector()
+    selector.register(ingest.sock, selectors.EVENT_READ)
+    period = 1.0 / args.tick_rate
+    started = last_report = next_fold = time.monotonic()
+    busy = 0.0
+    reported = ingest.stats()
+    try:
+        while args.duration is None or time.monotonic() - started < args.duration:
+            now = time.monotonic()
+            if selector.select(max(0.0, next_fold - now)):
+                t0 = time.perf_counter()
+                ingest.receive()
+                busy += time.perf_counter() - t0
+            now = time.monotonic()
+            if now >= next_fold:
+                next_fold += period
+                t0 = time.perf_counter()
+                ingest.fold(sensors, now)
+                busy += time.perf_counter() - t0
+            if now - last_report >= 1.0:
+                stats = ingest.stats()
+                elapsed = now - last_report
+                print(f"📥 {(stats['datagrams'] - reported['datagrams']) / elapsed:,.0f} datagrams/s  "
+                      f"{(stats['readings'] - reported['readings']) / elapsed:,.0f} readings/s  "
+                      f"busy {busy / elapsed * 100:.0f}%  sources {stats['sources']}  "
+                      f"late {stats['late']}  lost {stats['lost']}  malformed {stats['malformed']}  "
+                      f"NS {sensors['vehicle_count_ns']} EW {sensors['vehicle_count_ew']}")
+                reported, last_report, busy = stats, now, 0.0
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingest.close()
+    print(ingest.stats())
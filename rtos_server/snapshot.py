@@ -0,0 +1,46 @@
+"""
+STATE SNAPSHOTS - One encoded frame per controller tick
+"""
+import json
+
+
+class StateSnapshot:
+    """Immutable view of one tick's state, serialized once and shared by all clients
+
+    state must be built fresh for the snapshot (see RobustRTOS.snapshot_state) so the controller
+    never mutates anything a reader can reach. The encoded frame also carries seq, so full-state
+    clients can match it against command ACKs.
+    """
+
+    __slots__ = ("seq", "state", "payload")
+
+    def __init__(self, seq, state):
+        object.__setattr__(self, "seq", seq)
+        object.__setattr__(self, "state", state)
+        payload = (json.dumps(dict(state, seq=seq), separators=(",", ":")) + "\n").encode()
+        object.__setattr__(self, "payload", payload)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StateSnapshot is immutable")
+
+
+class SnapshotCell:
+    """Holds the latest published snapshot: the controller swaps the reference, readers never lock
+
+    Publishing is a single reference store, atomic under the GIL, so a reader on any thread gets
+    either the previous version or the new one, never a mix, and keeps it for as long as it holds it.
+    """
+
+    __slots__ = ("current", "published")
+
+    def __init__(self, snapshot=None):
+        self.current = snapshot
+        self.published = 0  # Only the controller thread writes
+
+    def publish(self, snapshot):
+        self.current = snapshot
+        self.published += 1
+        return snapshot
+
+    def get(self):
+        return self.current
@@ -0,0 +1,154 @@
+"""
+PARAMETER SWEEP - Headless RobustRTOS runs over a scenario grid, one process per run
+"""
+import contextlib
+import csv
+import io
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rtos_server_advanced import RobustRTOS
+from clock import VirtualClock
+
+RESULT_FIELDS = [
+    "run", "ns_green", "yellow", "ew_green", "emergency_deadline", "weather_mix", "seed",
+    "vehicles", "throughput_per_min", "avg_wait_s", "max_wait_s", "queued_at_end",
+    "emergencies", "worst_emergency_ms", "emergency_misses", "deadline_misses", "wall_s",
+]
+
+
+def parse_weather_mix(spec):
+    """'CLEAR=0.6,RAIN=0.3,SNOW=0.1' -> {'CLEAR': 0.6, 'RAIN': 0.3, 'SNOW': 0.1}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip().upper()] = float(weight) if weight else 1.0
+    return mix
+
+
+def scenario_commands(scenario, duration):
+    """Timed weather changes and emergency calls for one run, reproducible from its seed"""
+    rng = random.Random(scenario["seed"])
+    commands = []
+
+    mix = parse_weather_mix(scenario["weather_mix"])
+    names, weights = list(mix), list(mix.values())
+    at = 0.0
+    while at < duration:
+        weather = rng.choices(names, weights)[0]
+        commands.append((at, {"event": "CHANGE_WEATHER", "data": {"weather": weather}}))
+        at += scenario["weather_period"]
+
+    rate = scenario["emergencies_per_hour"] / 3600.0
+    at = rng.expovariate(rate) if rate > 0 else duration
+    while at < duration:
+        commands.append((at, {"event": "EMERGENCY"}))
+        at += rng.expovariate(rate)
+    return commands
+
+
+def run_scenario(scenario):
+    """Worker: one virtual-clock simulation, returns a result row"""
+    duration = scenario["duration"]
+    commands = scenario_commands(scenario, duration)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Runs are silent, the table is the output
+        rtos = RobustRTOS(policy=scenario["policy"], clock=VirtualClock(),
+                          splits=(scenario["ns_green"], scenario["yellow"], scenario["ew_green"]),
+                          emergency_deadline=scenario["emergency_deadline"], seed=scenario["seed"])
+        final = rtos.run_simulation(duration, commands)
+    wall = time.perf_counter() - started
+
+    traffic = rtos.traffic.stats()
+    vehicles = rtos.traffic.total_departed
+    row = {field: scenario.get(field) for field in RESULT_FIELDS}
+    row.update({
+        "vehicles": vehicles,
+        "throughput_per_min": round(vehicles / duration * 60, 2),
+        "avg_wait_s": traffic["avg_wait_s"],
+        "max_wait_s": traffic["max_wait_s"],
+        "queued_at_end": sum(traffic["queued"].values()),
+        "emergencies": sum(1 for _, cmd in commands if cmd["event"] == "EMERGENCY"),
+        "worst_emergency_ms": round(rtos.worst_emergency_response, 3),
+        "emergency_misses": rtos.emergency_deadline_misses,
+        "deadline_misses": final["metrics"]["deadline_misses"],
+        "wall_s": round(wall, 2),
+    })
+    return row
+
+
+def build_grid(args):
+    """Cartesian product of every swept parameter, repeated with distinct seeds"""
+    grid = itertools.product(args.ns_green, args.yellow, args.ew_green, args.deadline,
+                             args.weather_mix, range(args.repeats))
+    scenarios = []
+    for run, (ns_green, yellow, ew_green, deadline, mix, repeat) in enumerate(grid):
+        scenarios.append({
+            "run": run,
+            "ns_green": ns_green,
+            "yellow": yellow,
+            "ew_green": ew_green,
+            "emergency_deadline": deadline,
+            "weather_mix": mix,
+            "seed": args.seed + repeat,
+            "duration": args.duration,
+            "policy": args.policy,
+            "weather_period": args.weather_period,
+            "emergencies_per_hour": args.emergencies_per_hour,
+        })
+    return scenarios
+
+
+def run_sweep(scenarios, workers=None):
+    """Run every scenario across a process pool; rows come back in run order"""
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_scenario, scenario) for scenario in scenarios]
+        for done, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            rows.append(row)
+            print(f"✅ [{done}/{len(scenarios)}] run {row['run']}: "
+                  f"wait {row['avg_wait_s']}s, {row['throughput_per_min']} veh/min ({row['wall_s']}s)")
+    rows.sort(key=lambda row: row["run"])
+    return rows
+
+
+def write_results(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep signal plans and scenarios over headless simulations")
+    parser.add_argument("--duration", type=float, default=3600.0, help="simulated seconds per run")
+    parser.add_argument("--ns-green", type=float, nargs="+", default=[15.0])
+    parser.add_argument("--yellow", type=float, nargs="+", default=[3.0])
+    parser.add_argument("--ew-green", type=float, nargs="+", default=[12.0])
+    parser.add_argument("--deadline", type=float, nargs="+", default=[500.0],
+                        help="emergency deadlines in ms")
+    parser.add_argument("--weather-mix", nargs="+", default=["CLEAR=1"],
+                        help="weighted weather mixes, e.g. CLEAR=0.6,RAIN=0.3,SNOW=0.1")
+    parser.add_argument("--weather-period", type=float, default=900.0,
+                        help="seconds between weather draws")
+    parser.add_argument("--emergencies-per-hour", type=float, default=4.0)
+    parser.add_argument("--policy", choices=["fp", "rm", "edf"], default="fp")
+    parser.add_argument("--repeats", type=int, default=1, help="runs per grid point, each with its own seed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    scenarios = build_grid(args)
+    workers = args.workers or os.cpu_count()
+    print(f"🧪 {len(scenarios)} runs x {args.duration:.0f}s simulated on {workers} workers")
+    started = time.perf_counter()
+    rows = run_sweep(scenarios, workers)
+    write_results(rows, args.output)
+    print(f"📄 {len(rows)} results written to {args.output} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,109 @@
+"""
+PERIODIC TICKER - Drift-free controller tick scheduled against absolute deadlines
+"""
+import time
+from instrumentation import Histogram
+
+OVERRUN_SKIP = "skip"        # Drop missed deadlines and stay phase-aligned
+OVERRUN_CATCHUP = "catchup"  # Run missed ticks back to back
+OVERRUN_POLICIES = (OVERRUN_SKIP, OVERRUN_CATCHUP)
+
+
+class PeriodicTicker:
+    """Tracks the next absolute tick deadline and records period, jitter, late starts and overruns"""
+
+    def __init__(self, rate_hz=10.0, overrun=OVERRUN_SKIP, clock=time.monotonic, max_catchup=10):
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy: {overrun}")
+        self.interval = 1.0 / rate_hz if rate_hz else 0.0  # 0 = unpaced, every check is due
+        self.overrun = overrun
+        self.clock = clock
+        self.max_catchup = max_catchup
+        self.next_deadline = clock()
+        self.current_deadline = None
+        self.tick_started_at = None
+        self.last_start = None
+        self.ticks = 0
+
+        # Measurements (milliseconds)
+        self.period_hist = Histogram()
+        self.jitter_hist = Histogram()
+        self.duration_hist = Histogram()
+        self.late_starts = 0  # Ticks that started a whole period or more after their deadline
+        self.overruns = 0     # Ticks that ran longer than one period
+        self.skipped = 0
+
+    @property
+    def rate(self):
+        return 1.0 / self.interval if self.interval else None
+
+    def set_rate(self, rate_hz, now=None):
+        """Change the tick rate from the next tick on; None or 0 runs unpaced"""
+        self.interval = 1.0 / rate_hz if rate_hz else 0.0
+        self.next_deadline = self.clock() if now is None else now
+
+    def time_until_next(self, now=None):
+        if now is None:
+            now = self.clock()
+        return max(0.0, self.next_deadline - now)
+
+    def due(self, now=None):
+        return (self.clock() if now is None else now) >= self.next_deadline
+
+    def begin(self, now=None):
+        """Mark the start of a tick and schedule the next deadline"""
+        if now is None:
+            now = self.clock()
+        deadline = self.next_deadline
+        self.current_deadline = deadline
+        self.tick_started_at = now
+        self.jitter_hist.observe((now - deadline) * 1000)
+        if self.last_start is not None:
+            self.period_hist.observe((now - self.last_start) * 1000)
+        self.last_start = now
+        self.ticks += 1
+        if not self.interval:
+            self.next_deadline = now
+            return deadline
+
+        next_deadline = deadline + self.interval
+        if now >= next_deadline:
+            # Started a whole period late
+            self.late_starts += 1
+            behind = int((now - deadline) / self.interval)
+            if self.overrun == OVERRUN_SKIP or behind > self.max_catchup:
+                self.skipped += behind
+                next_deadline = deadline + (behind + 1) * self.interval
+        self.next_deadline = next_deadline
+        return deadline
+
+    def end(self, now=None):
+        """Mark the end of a tick"""
+        if self.tick_started_at is None:
+            return
+        if now is None:
+            now = self.clock()
+        self.duration_hist.observe((now - self.tick_started_at) * 1000)
+        if self.interval and now - self.tick_started_at > self.interval:
+            self.overruns += 1
+        self.tick_started_at = None
+
+    def stats(self):
+        return {
+            "rate_hz": round(self.rate, 2) if self.interval else None,
+            "ticks": self.ticks,
+            "period_ms": self.period_hist.summary(),
+            "jitter_ms": self.jitter_hist.summary(),
+            "tick_duration_ms": self.duration_hist.summary(),
+            "late_starts": self.late_starts,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+        }
+
+    def reset_stats(self):
+        self.period_hist.reset()
+        self.jitter_hist.reset()
+        self.duration_hist.reset()
+        self.late_starts = 0
+        self.overruns = 0
+        self.skipped = 0
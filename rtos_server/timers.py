@@ -0,0 +1,91 @@
+"""
+TIMER WHEEL - One-shot controller timers driven by the tick, no extra threads
+"""
+import time
+
+
+class TimerEntry:
+    __slots__ = ("key", "deadline", "callback", "slot")
+
+    def __init__(self, key, deadline, callback, slot):
+        self.key = key
+        self.deadline = deadline
+        self.callback = callback
+        self.slot = slot
+
+
+class TimerWheel:
+    """Hashed timing wheel keyed by name: scheduling an existing key moves its deadline"""
+
+    def __init__(self, resolution=0.05, slots=256, clock=time.monotonic):
+        self.resolution = resolution
+        self.slots = [dict() for _ in range(slots)]
+        self.timers = {}
+        self.clock = clock
+        self.last_tick = int(clock() / resolution)
+        self.fired = 0
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def _slot_for(self, deadline):
+        # Never file a timer behind the wheel position, it would wait a whole lap
+        tick = max(int(deadline / self.resolution), self.last_tick)
+        return tick % len(self.slots)
+
+    def schedule(self, key, delay, callback, now=None):
+        """Run callback once, delay seconds from now; replaces any timer with the same key"""
+        if now is None:
+            now = self.clock()
+        self.cancel(key)
+        deadline = now + max(0.0, delay)
+        entry = TimerEntry(key, deadline, callback, self._slot_for(deadline))
+        self.slots[entry.slot][key] = entry
+        self.timers[key] = entry
+        return entry
+
+    def cancel(self, key):
+        entry = self.timers.pop(key, None)
+        if entry is None:
+            return False
+        del self.slots[entry.slot][key]
+        return True
+
+    def remaining(self, key, now=None):
+        """Seconds until the timer fires, or None if it is not scheduled"""
+        entry = self.timers.get(key)
+        if entry is None:
+            return None
+        return max(0.0, entry.deadline - (self.clock() if now is None else now))
+
+    def advance(self, now=None):
+        """Fire every timer that is due, in deadline order. Returns how many fired"""
+        if now is None:
+            now = self.clock()
+        tick = int(now / self.resolution)
+        if tick < self.last_tick:
+            return 0
+
+        # Visit each slot passed since the last call, at most one full turn
+        span = min(tick - self.last_tick + 1, len(self.slots))
+        due = []
+        for offset in range(span):
+            slot = self.slots[(tick - offset) % len(self.slots)]
+            for entry in slot.values():
+                if entry.deadline <= now:  # Later laps of the wheel stay put
+                    due.append(entry)
+        self.last_tick = tick
+
+        due.sort(key=lambda entry: entry.deadline)
+        fired = 0
+        for entry in due:
+            # An earlier callback may have cancelled or rescheduled this key
+            if self.timers.get(entry.key) is entry:
+                self.cancel(entry.key)
+                fired += 1
+                entry.callback()
+        self.fired += fired
+        return fired